@@ -0,0 +1,30 @@
+# I sincerely swear that this is one-off code.
+"""
+Helpers shared by the benchmarks, which import this from the directory
+they're run from.
+"""
+
+from __future__ import unicode_literals
+
+import timeit
+
+from flake8.engine import get_parser
+
+from ebb_lint.flake8 import EbbLint
+
+
+def best_of(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def set_up_ebb_lint(*codes):
+    """
+    Set EbbLint up with the default options, less the result cache, checking
+    only for ``codes`` if any are given.
+    """
+    parser, _ = get_parser()
+    options, _ = parser.parse_args(['--no-ebb-lint-cache'])
+    options.ignore = tuple(options.ignore)
+    if codes:
+        options.ignore_code = lambda code: code not in codes
+    EbbLint.parse_options(options)
@@ -0,0 +1,101 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure how many patterns each node is matched against.
+
+Run with ``python benchmarks/bench_dispatch.py [file ...]``. Every node of each
+file's tree is matched against every checker's pattern, and then against only
+the patterns the checker index says could match its type, and then against
+the patterns the bottom matcher found could match it, and last the same as
+the index but skipping subtrees nothing could match in; the number of match
+attempts per node and the time taken by each are reported. Checkers are never
+called, so only the cost of matching is measured.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import argparse
+import inspect
+import io
+import sys
+
+from ebb_lint.flake8 import (
+    EbbLint, detect_future_features, driver_for_grammar,
+    grammar_for_future_features, parse_source,
+    read_file_using_source_encoding)
+from ebb_lint.matchers import BottomMatcher
+from ebb_lint.tokens import TokenTable
+from ebb_lint.traversal import Walker
+
+from _common import best_of, set_up_ebb_lint
+
+
+def match_all(nodes, checkers):
+    attempts = 0
+    for node in nodes:
+        for pattern, _, _ in checkers:
+            attempts += 1
+            pattern.match(node, {})
+    return attempts
+
+
+def match_indexed(tree, index, types=None):
+    by_type, any_type = index
+    attempts = 0
+    for node, _ in Walker([tree], types):
+        for pattern, _, _ in by_type.get(node.type, any_type):
+            attempts += 1
+            pattern.match(node, {})
+    return attempts
+
+
+def match_bottom_up(tree, bottom_matcher):
+    attempts = 0
+    for node, checkers in bottom_matcher.run(tree):
+        for pattern, _, _ in checkers:
+            attempts += 1
+            pattern.match(node, {})
+    return attempts
+
+
+def main(filenames):
+    set_up_ebb_lint()
+    checkers = EbbLint.collected_checkers
+    index = EbbLint.collected_index
+    types = EbbLint.collected_subtree_types
+    bottom_matcher = BottomMatcher(checkers)
+
+    if not filenames:
+        filenames = [
+            inspect.getsourcefile(module)
+            for module in [argparse, inspect, io]]
+    print('{:<24} {:>6} {:>9} {:>9} {:>9} {:>9} {:>8} {:>8} {:>9} {:>9}'
+          .format('file', 'nodes', 'all/n', 'index/n', 'bottom/n',
+                  'pruned/n', 'all ms', 'index ms', 'bottom ms',
+                  'pruned ms'))
+    for filename in filenames:
+        source = read_file_using_source_encoding(filename)
+        grammar = grammar_for_future_features(
+            detect_future_features(TokenTable(source)))
+        tree, _ = parse_source(driver_for_grammar(grammar), source)
+        nodes = list(tree.pre_order())
+        all_attempts = match_all(nodes, checkers)
+        indexed_attempts = match_indexed(tree, index)
+        all_time = best_of(lambda: match_all(nodes, checkers))
+        bottom_attempts = match_bottom_up(tree, bottom_matcher)
+        indexed_time = best_of(lambda: match_indexed(tree, index))
+        bottom_time = best_of(lambda: match_bottom_up(tree, bottom_matcher))
+        pruned_attempts = match_indexed(tree, index, types)
+        pruned_time = best_of(lambda: match_indexed(tree, index, types))
+        print(('{:<24} {:6d} {:9.2f} {:9.2f} {:9.2f} {:9.2f} {:8.1f} {:8.1f} '
+               '{:9.1f} {:9.1f}')
+              .format(filename[-24:], len(nodes), all_attempts / len(nodes),
+                      indexed_attempts / len(nodes),
+                      bottom_attempts / len(nodes),
+                      pruned_attempts / len(nodes), all_time * 1e3,
+                      indexed_time * 1e3, bottom_time * 1e3,
+                      pruned_time * 1e3))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,55 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure the per-file overhead of building a lib2to3 driver.
+
+Run with ``python benchmarks/bench_driver.py [n]``. The per-file setup cost is
+timed on its own, and then against a parse of a small module, so that the
+saving can be compared with the total cost of a file.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import sys
+import timeit
+
+from lib2to3 import pytree
+from lib2to3.pgen2 import driver
+
+from ebb_lint.flake8 import (
+    driver_for_grammar, grammar_for_future_features, parse_source)
+
+
+source = '''
+import os
+
+
+def f(x):
+    return os.path.join(x, 'spam')
+'''
+
+
+def fresh_driver():
+    return driver.Driver(
+        grammar_for_future_features(frozenset()), convert=pytree.convert)
+
+
+def shared_driver():
+    return driver_for_grammar(grammar_for_future_features(frozenset()))
+
+
+def report(name, func, n):
+    seconds = min(timeit.repeat(func, number=n, repeat=5))
+    print('{:<28} {:10.2f} us/file'.format(name, seconds / n * 1e6))
+
+
+def main(n=2000):
+    report('fresh driver', fresh_driver, n)
+    report('shared driver', shared_driver, n)
+    report('fresh driver + parse',
+           lambda: parse_source(fresh_driver(), source), n)
+    report('shared driver + parse',
+           lambda: parse_source(shared_driver(), source), n)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,86 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure looking for implicit relative imports.
+
+Run with ``python2 benchmarks/bench_imports.py [n_modules [n_imports]]``; the
+check is only done on python 2. A package of ``n_modules`` modules is
+generated, each importing ``n_imports`` names, some of which are the
+package's own modules, and every module is linted with only that error
+selected. The number of ``stat`` and ``listdir`` calls made the first time
+every module is linted is reported, along with the time taken to lint them
+all.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import os
+import shutil
+import sys
+import tempfile
+
+from ebb_lint.flake8 import EbbLint
+
+from _common import best_of, set_up_ebb_lint
+
+
+def make_package(directory, n_modules, n_imports):
+    filenames = []
+    for e in range(n_modules):
+        filename = os.path.join(directory, 'module_{}.py'.format(e))
+        with open(filename, 'w') as outfile:
+            for i in range(n_imports):
+                if i % 4 == 0:
+                    outfile.write('import module_{}\n'.format(
+                        (e + i) % n_modules))
+                else:
+                    outfile.write('import stdlib_{}.sub\n'.format(i))
+        filenames.append(filename)
+    return filenames
+
+
+def lint_all(filenames):
+    n_errors = 0
+    for filename in filenames:
+        n_errors += sum(1 for _ in EbbLint(None, filename).run())
+    return n_errors
+
+
+def counting_calls(func, names):
+    calls = {name: 0 for name in names}
+    originals = {name: getattr(os, name) for name in names}
+
+    def counting(name):
+        def call(*a, **kw):
+            calls[name] += 1
+            return originals[name](*a, **kw)
+        return call
+
+    for name in names:
+        setattr(os, name, counting(name))
+    try:
+        ret = func()
+    finally:
+        for name, original in originals.items():
+            setattr(os, name, original)
+    return ret, [calls[name] for name in names]
+
+
+def main(n_modules=50, n_imports=200):
+    set_up_ebb_lint('L206')
+
+    directory = tempfile.mkdtemp()
+    try:
+        filenames = make_package(directory, n_modules, n_imports)
+        n_errors, (n_stats, n_listdirs) = counting_calls(
+            lambda: lint_all(filenames), ['stat', 'listdir'])
+        elapsed = best_of(lambda: lint_all(filenames))
+        print('{} modules, {} imports each'.format(n_modules, n_imports))
+        print('{} errors, {} stat calls, {} listdir calls, {:.1f} ms'.format(
+            n_errors, n_stats, n_listdirs, elapsed * 1e3))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
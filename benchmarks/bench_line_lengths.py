@@ -0,0 +1,88 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure checking line lengths.
+
+Run with ``python benchmarks/bench_line_lengths.py [n]``. A module of ``n``
+long lines which are mostly SQL in string literals is generated, and linted
+along with a few modules from the standard library, with only the line length
+and noqa errors selected, so nothing is parsed, and then so are all of the
+modules in the standard library's ``email`` package together, which are
+typical of a clean codebase. Each file's tokens are read once up front, so
+only the time spent measuring lines and looking for noqa comments is
+reported.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import argparse
+import email
+import glob
+import inspect
+import io
+import os
+import sys
+
+import ebb_lint.flake8
+from ebb_lint.flake8 import EbbLint, read_file_using_source_encoding
+from ebb_lint.tokens import TokenTable
+
+from _common import best_of, set_up_ebb_lint
+
+
+sql_lines = [
+    ("    cursor.execute('SELECT id, name, email FROM users WHERE id = %s "
+     "AND deleted_at IS NULL', [user_id])\n"),
+    ("    rows = query('UPDATE accounts SET balance = balance - %s WHERE id "
+     "= %s')  # debit\n"),
+    ("    log.debug('fetched %d rows for account %s', len(rows), "
+     "account.id, extra={'request': request.id})\n"),
+]
+
+
+def sql_source(n):
+    lines = ['def queries(cursor, user_id, account, request, log):\n']
+    for e in range(n):
+        lines.append(sql_lines[e % len(sql_lines)])
+    return ''.join(lines)
+
+
+def lint_with_tokens(sources):
+    errors = []
+    for source, tokens in sources:
+        ebb_lint.flake8.TokenTable = lambda source: tokens
+        lint = EbbLint(None, 'source.py', lines=[source])
+        errors.extend(lint._run_uncached())
+    return errors
+
+
+def main(n=5000):
+    set_up_ebb_lint('L302', 'L303')
+
+    files = [('{} SQL lines'.format(n), [sql_source(n)])]
+    for module in [argparse, inspect, io]:
+        filename = inspect.getsourcefile(module)
+        files.append((
+            module.__name__ + '.py',
+            [read_file_using_source_encoding(filename)]))
+    email_dir = os.path.dirname(email.__file__)
+    files.append(('email/*.py', [
+        read_file_using_source_encoding(path)
+        for path in sorted(glob.glob(os.path.join(email_dir, '*.py')))]))
+
+    print('{:<16} {:>7} {:>10} {:>8} {:>9} {:>8}'.format(
+        'file', 'lines', 'long lines', 'errors', 'ms', 'us/line'))
+    for name, sources in files:
+        lines = [line for source in sources for line in source.splitlines()]
+        n_long = sum(
+            1 for line in lines if len(line) > EbbLint.options.max_line_length)
+        tokenized = [(source, TokenTable(source)) for source in sources]
+        n_errors = len(lint_with_tokens(tokenized))
+        elapsed = best_of(lambda: lint_with_tokens(tokenized))
+        print('{:<16} {:7d} {:10d} {:8d} {:9.2f} {:8.2f}'.format(
+            name, len(lines), n_long, n_errors, elapsed * 1e3,
+            elapsed * 1e6 / len(lines)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
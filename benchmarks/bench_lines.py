@@ -0,0 +1,77 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure the memory and time taken by Lines.
+
+Run with ``python benchmarks/bench_lines.py [n]``. A module of ``n`` lines is
+generated, and its Lines built; the memory they hold on to is reported
+(python 3 only, since it's measured with ``tracemalloc``) next to a list of
+``(offset, line)`` tuples like Lines used to keep, along with the time taken
+to build them and to convert every line's first position to an offset and
+back again.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import sys
+
+from ebb_lint.flake8 import Lines
+
+from _common import best_of
+
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: nocover
+    tracemalloc = None
+
+
+def generated_source(n):
+    return ''.join(
+        'value_{0} = compute({0}, "{1}")  # {0}\n'.format(e, 'x' * (e % 40))
+        for e in range(n))
+
+
+def tuples(source):
+    ret = [(0, '')]
+    count = 0
+    for line in source.splitlines(True):
+        ret.append((count, line))
+        count += len(line)
+    return ret
+
+
+def retained(func, source):
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = func(source)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def round_trip(lines):
+    for lineno in range(1, len(lines)):
+        lines.position_of_byte(lines.byte_of_pos(lineno, 0))
+
+
+def main(n=100000):
+    source = generated_source(n)
+    lines = Lines(source)
+    print('{} lines, {:.1f} MB of source'.format(n, len(source) / 1e6))
+    for name, func in [('tuples', tuples), ('Lines', Lines)]:
+        memory = retained(func, source)
+        print('{:<8} {:>12} kept, {:8.1f} ms to build'.format(
+            name,
+            'unknown' if memory is None
+            else '{:.1f} MB'.format(memory / 1e6),
+            best_of(lambda: func(source)) * 1e3))
+    print('{:.1f} ms to convert every line to an offset and back'.format(
+        best_of(lambda: round_trip(lines)) * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
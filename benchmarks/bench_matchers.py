@@ -0,0 +1,77 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure how long each checker's pattern takes to match.
+
+Run with ``python benchmarks/bench_matchers.py [file ...]``. For each checker,
+every node of each file's tree which the checker index says its pattern could
+match is matched against it, first by lib2to3 and then by the compiled
+matcher; the time taken by each is reported. Checkers are never called, so
+only the cost of matching is measured.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import argparse
+import inspect
+import io
+import sys
+
+from ebb_lint.flake8 import (
+    EbbLint, detect_future_features, driver_for_grammar,
+    grammar_for_future_features, parse_source,
+    read_file_using_source_encoding)
+from ebb_lint.tokens import TokenTable
+
+from _common import best_of, set_up_ebb_lint
+
+
+def match_each(match, nodes):
+    for node in nodes:
+        match(node, {})
+
+
+def speedup(before, after):
+    if not after:
+        return '-'
+    return '{:.1f}x'.format(before / after)
+
+
+def main(filenames):
+    set_up_ebb_lint()
+    by_type, any_type = EbbLint.collected_index
+
+    if not filenames:
+        filenames = [
+            inspect.getsourcefile(module)
+            for module in [argparse, inspect, io]]
+    nodes = []
+    for filename in filenames:
+        source = read_file_using_source_encoding(filename)
+        grammar = grammar_for_future_features(
+            detect_future_features(TokenTable(source)))
+        tree, _ = parse_source(driver_for_grammar(grammar), source)
+        nodes.extend(tree.pre_order())
+
+    print('{:<40} {:>7} {:>11} {:>11} {:>8}'.format(
+        'checker', 'nodes', 'lib2to3 ms', 'compiled ms', 'speedup'))
+    totals = [0, 0]
+    for matcher, checker, _ in EbbLint.collected_checkers:
+        candidates = [
+            node for node in nodes
+            if (matcher, checker, _) in by_type.get(node.type, any_type)]
+        lib2to3_time = best_of(
+            lambda: match_each(matcher.pattern.match, candidates))
+        compiled_time = best_of(lambda: match_each(matcher.match, candidates))
+        totals[0] += lib2to3_time
+        totals[1] += compiled_time
+        print('{:<40} {:7d} {:11.2f} {:11.2f} {:>8}'.format(
+            checker.__name__[:40], len(candidates), lib2to3_time * 1e3,
+            compiled_time * 1e3, speedup(lib2to3_time, compiled_time)))
+    print('{:<40} {:>7} {:11.2f} {:11.2f} {:>8}'.format(
+        'total', '', totals[0] * 1e3, totals[1] * 1e3,
+        speedup(*totals)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
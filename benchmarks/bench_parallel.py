@@ -0,0 +1,55 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure how linting scales with the number of processes.
+
+Run with ``python benchmarks/bench_parallel.py [max_jobs [directory ...]]``.
+Every python file in each directory (the standard library's top level, by
+default) is linted without the cache by ``ebb-lint`` with one process, then
+two, and so on up to ``max_jobs`` (the number of available cores, by
+default). The time taken and speedup over one process are reported for each.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import glob
+import os
+import sys
+import time
+
+from ebb_lint import cli
+
+
+def timed(func):
+    start = time.time()
+    ret = func()
+    return time.time() - start, ret
+
+
+def main(max_jobs=None, *directories):
+    max_jobs = int(max_jobs) if max_jobs else cli.available_cores()
+    if not directories:
+        directories = [os.path.dirname(os.__file__)]
+    filenames = sorted(
+        path for directory in directories
+        for path in glob.glob(os.path.join(directory, '*.py')))
+    options, _ = cli.make_parser().parse_args(['--no-ebb-lint-cache'])
+    values = dict(vars(options))
+    del values['jobs']
+    print('{} files, {} available cores'.format(
+        len(filenames), cli.available_cores()))
+    print('{:>4} {:>10} {:>8} {:>8}'.format('jobs', 'ms', 'speedup', 'errors'))
+    # Set up the checkers in this process beforehand, as every worker does
+    # for itself.
+    cli.lint_file(values, filenames[0])
+    baseline = None
+    for jobs in range(1, max_jobs + 1):
+        elapsed, errors = timed(
+            lambda: cli.lint_files(values, filenames, jobs))
+        if baseline is None:
+            baseline = elapsed
+        print('{:4d} {:10.0f} {:8.2f} {:8d}'.format(
+            jobs, elapsed * 1e3, baseline / elapsed, len(errors)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,58 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure reading and decoding source files.
+
+Run with ``python benchmarks/bench_reading.py [directory ...]``. Every python
+file in each directory (the standard library's, by default) is read the way
+ebb-lint used to, opening each file once to detect its encoding and again to
+decode it, and then with ``read_file_using_source_encoding``, which opens each
+file once and maps the big ones; the time taken by each is reported.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import glob
+import io
+import os
+import sys
+from lib2to3.pgen2 import tokenize
+
+from ebb_lint.flake8 import read_file_using_source_encoding
+
+from _common import best_of
+
+
+def read_twice(filename):
+    with open(filename, 'rb') as infile:
+        encoding = tokenize.detect_encoding(infile.readline)[0]
+    with io.open(filename, 'r', encoding=encoding) as infile_with_encoding:
+        return infile_with_encoding.read()
+
+
+def read_all(read, filenames):
+    for filename in filenames:
+        read(filename)
+
+
+def main(directories):
+    if not directories:
+        directories = [os.path.dirname(os.__file__)]
+    print('{:<40} {:>6} {:>8} {:>12} {:>12}'.format(
+        'directory', 'files', 'MB', 'two opens ms', 'one open ms'))
+    for directory in directories:
+        filenames = sorted(glob.glob(os.path.join(directory, '*.py')))
+        size = sum(os.path.getsize(filename) for filename in filenames)
+        for filename in filenames:
+            assert read_twice(filename) == (
+                read_file_using_source_encoding(filename))
+        twice = best_of(lambda: read_all(read_twice, filenames))
+        once = best_of(
+            lambda: read_all(read_file_using_source_encoding, filenames))
+        print('{:<40} {:6d} {:8.1f} {:12.2f} {:12.2f}'.format(
+            directory[-40:], len(filenames), size / 1e6, twice * 1e3,
+            once * 1e3))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure the time from starting to lint to the first result.
+
+Run with ``python benchmarks/bench_startup.py [n]``. Each run is a fresh
+python process, which loads flake8 and its plugins, parses options, and lints
+one small file; the time from the first import to the first result is
+reported. lib2to3's grammars are loaded from ebb-lint's prebuilt tables and
+from lib2to3's own pickles, and the checkers are loaded from their cache and
+scanned for and compiled from scratch. Last, only one checker module's errors
+are selected, so only that module is loaded.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import os
+import subprocess
+import sys
+import tempfile
+
+
+child = '''
+import time
+start = time.time()
+import ebb_lint.flake8
+from flake8.engine import get_parser
+parser, _ = get_parser()
+options, _ = parser.parse_args([])
+options.ignore = tuple(options.ignore)
+{setup}
+ebb_lint.flake8.EbbLint.parse_options(options)
+# Only the checkers are cached; the file is linted from scratch every time.
+ebb_lint.flake8.EbbLint._result_store = None
+next(ebb_lint.flake8.EbbLint(None, {filename!r}).run())
+print(time.time() - start)
+'''
+
+
+source = '''
+import pdb
+
+
+def f(x):
+    return [
+        x
+    ]
+'''
+
+
+pickles = '''
+def load_pygram():
+    from lib2to3 import pygram
+    return pygram
+ebb_lint.flake8.load_pygram = load_pygram
+'''
+
+
+scanning = '''
+import atexit, functools, os, shutil, tempfile
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp()
+atexit.register(functools.partial(shutil.rmtree, os.environ['XDG_CACHE_HOME']))
+'''
+
+
+# Only the errors in one checker module are enabled, the way flake8's
+# --select=L201 would do it.
+selected = '''
+options.ignore_code = lambda code: code != 'L201'
+'''
+
+
+def run(setup, filename):
+    output = subprocess.check_output([
+        sys.executable, '-c', child.format(setup=setup, filename=filename)])
+    return float(output.decode().strip())
+
+
+def main(n=10):
+    fd, filename = tempfile.mkstemp(suffix='.py')
+    try:
+        with os.fdopen(fd, 'w') as outfile:
+            outfile.write(source)
+        modes = [
+            ('cached', ''),
+            ('lib2to3 pickles', pickles),
+            ('scanned checkers', scanning),
+            ('selected L201', selected),
+        ]
+        # Alternate between them, so that all of them see the same noise.
+        times = {name: [] for name, _ in modes}
+        # Make sure there's something in the cache first.
+        run('', filename)
+        for _ in range(n):
+            for name, setup in modes:
+                times[name].append(run(setup, filename))
+        for name, _ in modes:
+            print('{:<20} {:10.1f} ms to first result'.format(
+                name, min(times[name]) * 1e3))
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
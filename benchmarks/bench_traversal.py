@@ -0,0 +1,81 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure walking and checking deeply nested trees.
+
+Run with ``python benchmarks/bench_traversal.py [depth ...]``. For each depth,
+a module made of one literal with lists and dicts nested that deep is parsed,
+and then walked with lib2to3's ``pre_order`` and with ebb-lint's ``Walker``,
+and checked with every checker; the time taken by each is reported, along
+with the time per node, which should stay flat however deep the literal is.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import sys
+
+from ebb_lint.flake8 import (
+    EbbLint, driver_for_grammar, grammar_for_future_features, parse_source)
+from ebb_lint.tokens import TokenTable
+from ebb_lint.traversal import Walker
+
+from _common import best_of, set_up_ebb_lint
+
+
+def nested_literal(depth):
+    lines = ['data = {']
+    for level in range(1, depth):
+        lines.append('    ' * level + "'key': [{")
+    lines.append('    ' * depth + "'leaf': 'value',")
+    for level in reversed(range(1, depth)):
+        lines.append('    ' * level + '}],')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def walk_pre_order(tree):
+    for _ in tree.pre_order():
+        pass
+
+
+def walk_walker(tree):
+    for _ in Walker([tree]):
+        pass
+
+
+def best_of_or_none(func):
+    try:
+        return best_of(func)
+    except RuntimeError:
+        # Including RecursionError, on python 3.
+        return None
+
+
+def main(depths):
+    set_up_ebb_lint()
+    driver = driver_for_grammar(grammar_for_future_features(frozenset()))
+
+    print('{:>6} {:>7} {:>12} {:>12} {:>12} {:>10}'.format(
+        'depth', 'nodes', 'pre_order ms', 'Walker ms', 'checking ms',
+        'us/node'))
+    for depth in depths:
+        source = nested_literal(depth)
+        tree, _ = parse_source(driver, source)
+        n_nodes = sum(1 for _ in Walker([tree]))
+        lint = EbbLint(None, 'nested.py', lines=[source])
+        lint.tokens = TokenTable(source)
+        lint.future_features = frozenset()
+        pre_order_time = best_of_or_none(lambda: walk_pre_order(tree))
+        walker_time = best_of(lambda: walk_walker(tree))
+        check_time = best_of(
+            lambda: list(lint._check_tree(tree, EbbLint.active_index)))
+        print('{:6d} {:7d} {:>12} {:12.2f} {:12.2f} {:10.2f}'.format(
+            depth, n_nodes,
+            'too deep' if pre_order_time is None
+            else '{:.2f}'.format(pre_order_time * 1e3),
+            walker_time * 1e3, check_time * 1e3,
+            check_time * 1e6 / n_nodes))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 200, 400])
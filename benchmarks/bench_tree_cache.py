@@ -0,0 +1,47 @@
+# I sincerely swear that this is one-off code.
+"""
+Compare loading a cached parse tree with parsing the source again.
+
+Run with ``python benchmarks/bench_tree_cache.py [file ...]``. Without
+arguments, a few standard library modules are used.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import inspect
+import io
+import sys
+
+from ebb_lint.flake8 import (
+    detect_future_features, driver_for_grammar, grammar_for_future_features,
+    parse_source, read_file_using_source_encoding)
+from ebb_lint.tokens import TokenTable
+from ebb_lint.trees import deserialize_tree, serialize_tree
+
+from _common import best_of
+
+
+def main(filenames):
+    if not filenames:
+        filenames = [
+            inspect.getsourcefile(module)
+            for module in [argparse, inspect, io]]
+    print('{:<40} {:>10} {:>10} {:>8} {:>10}'.format(
+        'file', 'parse ms', 'load ms', 'speedup', 'kB stored'))
+    for filename in filenames:
+        source = read_file_using_source_encoding(filename)
+        grammar = grammar_for_future_features(detect_future_features(
+            TokenTable(source)))
+        d = driver_for_grammar(grammar)
+        tree, _ = parse_source(d, source)
+        data = serialize_tree(tree)
+        parse_time = best_of(lambda: parse_source(d, source))
+        load_time = best_of(lambda: deserialize_tree(data))
+        print('{:<40} {:10.2f} {:10.2f} {:7.1f}x {:10.1f}'.format(
+            filename[-40:], parse_time * 1e3, load_time * 1e3,
+            parse_time / load_time, len(data) / 1024))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+# I sincerely swear that this is one-off code.
+"""
+Measure starting ``ebb-lint``'s worker processes, with and without warming up
+the parent process first.
+
+Run with ``python benchmarks/bench_workers.py [jobs [repeat]]``; this only
+means anything where the process pool forks its workers, like on Linux. Each
+run starts a fresh interpreter, starts ``jobs`` workers (two, by default) and
+waits until every one of them has linted a small file. The time that takes,
+and each worker's resident and private memory afterward, are reported for
+workers which set themselves up and for workers forked from a warmed-up
+parent.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ebb_lint import cli
+
+
+def memory_kb():
+    """
+    Return this process's resident set size and the part of it which isn't
+    shared with any other process, in kB.
+    """
+    fields = {}
+    with open('/proc/self/smaps') as infile:
+        for line in infile:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0]] = fields.get(parts[0], 0) + int(parts[1])
+    return fields['Rss:'], fields['Private_Clean:'] + fields['Private_Dirty:']
+
+
+def lint_and_measure(values, filename):
+    cli.lint_file(values, filename)
+    return os.getpid(), time.time(), memory_kb()
+
+
+def start_workers(jobs, warm_parent, filename):
+    options, _ = cli.make_parser().parse_args(['--no-ebb-lint-cache'])
+    values = dict(vars(options))
+    del values['jobs']
+    start = time.time()
+    if warm_parent:
+        cli.warm_up(values)
+    with cli.process_pool(jobs) as executor:
+        results = list(executor.map(
+            lint_and_measure, [values] * jobs, [filename] * jobs))
+    workers = {pid: memory for pid, _, memory in results}
+    json.dump({
+        'elapsed': max(finished for _, finished, _ in results) - start,
+        'workers': list(workers.values()),
+        'parent': memory_kb(),
+    }, sys.stdout)
+
+
+def run(jobs, warm_parent, filename):
+    output = subprocess.check_output([
+        sys.executable, __file__, 'child', str(jobs),
+        'warm' if warm_parent else 'cold', filename])
+    return json.loads(output.decode())
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+def main(jobs=2, repeat=5):
+    jobs = int(jobs)
+    repeat = int(repeat)
+    with tempfile.NamedTemporaryFile(suffix='.py') as outfile:
+        outfile.write(b'z = map(lambda y: y, 1)\n')
+        outfile.flush()
+        print('{} workers, best of {} runs'.format(jobs, repeat))
+        print('{:<6} {:>12} {:>14} {:>14} {:>14}'.format(
+            'parent', 'start-up ms', 'parent RSS MB', 'worker RSS MB',
+            'private MB'))
+        for warm_parent in [False, True]:
+            runs = [run(jobs, warm_parent, outfile.name)
+                    for _ in range(repeat)]
+            best = min(runs, key=lambda r: r['elapsed'])
+            print('{:<6} {:12.0f} {:14.1f} {:14.1f} {:14.1f}'.format(
+                'warm' if warm_parent else 'cold', best['elapsed'] * 1e3,
+                best['parent'][0] / 1024,
+                mean([rss for rss, _ in best['workers']]) / 1024,
+                mean([private for _, private in best['workers']]) / 1024))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['child']:
+        start_workers(
+            int(sys.argv[2]), sys.argv[3] == 'warm', sys.argv[4])
+    else:
+        main(*sys.argv[1:])
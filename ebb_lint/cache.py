@@ -0,0 +1,113 @@
+from __future__ import unicode_literals
+
+import errno
+import os
+import sqlite3
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ebb-lint')
+
+
+# Recency is a counter kept in the database itself rather than a timestamp, so
+# that every process sharing the store agrees on the order of uses.
+_next_use = 'SELECT COALESCE(MAX(used), 0) + 1 FROM entries'
+
+
+class LRUStore(object):
+    """
+    A bounded, persistent mapping of text keys to bytes values.
+
+    The store lives in a single sqlite database, so it can be shared by
+    several processes linting at the same time. Once it holds more than
+    ``max_entries`` entries, the least recently used entries are evicted
+    until it holds nine tenths of that, so that counting and evicting happen
+    once per batch of writes rather than after every one once it's full.
+    The limit is enforced from each process's own count of what it has
+    written, so concurrent writers can overshoot it briefly.
+
+    A cache is never worth failing a lint run over, so errors opening or
+    querying the database are treated as misses and failed writes are dropped.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._connection = None
+        self._pid = None
+        self._count = 0
+
+    def _connect(self):
+        # sqlite connections can't be carried across a fork, so a child
+        # process opens its own.
+        pid = os.getpid()
+        if self._connection is not None and self._pid == pid:
+            return self._connection
+        try:
+            os.makedirs(os.path.dirname(self.path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None)
+        # Losing the last few writes to a crash only costs some cache misses,
+        # so there's no need to wait on the disk for every one.
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute(
+            ('CREATE TABLE IF NOT EXISTS entries ('
+             'key TEXT PRIMARY KEY, '
+             'value BLOB NOT NULL, '
+             'used INTEGER NOT NULL)'))
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+        [(self._count,)] = connection.execute('SELECT COUNT(*) FROM entries')
+        self._connection = connection
+        self._pid = pid
+        return connection
+
+    def get(self, key):
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                'UPDATE entries SET used = ({}) WHERE key = ?'.format(
+                    _next_use),
+                (key,))
+        except (OSError, sqlite3.Error):
+            return None
+        return bytes(row[0])
+
+    def put(self, key, value):
+        try:
+            connection = self._connect()
+            connection.execute(
+                ('INSERT OR REPLACE INTO entries (key, value, used) '
+                 'VALUES (?, ?, ({}))').format(_next_use),
+                (key, sqlite3.Binary(value)))
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict(connection)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _evict(self, connection):
+        [(count,)] = connection.execute('SELECT COUNT(*) FROM entries')
+        if count <= self.max_entries:
+            # Another process already evicted.
+            self._count = count
+            return
+        excess = count - self.max_entries * 9 // 10
+        connection.execute(
+            ('DELETE FROM entries WHERE key IN ('
+             'SELECT key FROM entries ORDER BY used LIMIT ?)'),
+            (excess,))
+        self._count = count - excess
+
+    def __len__(self):
+        [(count,)] = self._connect().execute('SELECT COUNT(*) FROM entries')
+        return count
@@ -1,11 +1,14 @@
 from __future__ import unicode_literals
 
+import ast
 import collections
 import re
+from lib2to3.pgen2 import token
 
 import enum
 
-from ebb_lint.checkers.registration import register_checker
+from ebb_lint.checkers.registration import (
+    register_ast_checker, register_checker)
 from ebb_lint.errors import Errors
 
 
@@ -168,7 +171,12 @@ def docstring_errors(purpose, docstring):
            suite< '\n' TOKEN simple_stmt< docstring=STRING any > any* > >
 )
 
-""")
+""", errors=[
+    Errors.docstring_formatting_error,
+    Errors.test_docstring_prefix,
+    Errors.use_napoleon_in_docstrings,
+    Errors.no_docstring_on_init,
+])
 def check_docstring(which, name, docstring):
     purpose = DocstringPurpose.other
     if which.value == 'def':
@@ -178,3 +186,49 @@ def check_docstring(which, name, docstring):
             yield docstring, Errors.no_docstring_on_init, {}
     for error, kw in docstring_errors(purpose, docstring.value):
         yield docstring, error, kw
+
+
+def header_colon(tokens, idx):
+    lambdas = 0
+    depth = 0
+    for idx in range(idx, len(tokens)):
+        value = tokens[idx].value
+        if value in {'(', '[', '{'}:
+            depth += 1
+        elif value in {')', ']', '}'}:
+            depth -= 1
+        elif depth:
+            continue
+        elif value == 'lambda':
+            lambdas += 1
+        elif value == ':':
+            if not lambdas:
+                return idx
+            lambdas -= 1
+    raise ValueError('no colon ends the header')  # pragma: nocover
+
+
+@register_ast_checker(
+    ['ClassDef', 'FunctionDef', 'AsyncFunctionDef'], replaces=check_docstring)
+def check_docstring_in_ast(node, tokens):
+    if not isinstance(node.body[0], ast.Expr):
+        return
+    # Before python 3.8, a decorated definition starts at its first
+    # decorator.
+    idx = tokens.index_of_node(node)
+    while not (tokens[idx].type == token.NAME
+               and tokens[idx].value in {'class', 'def'}):
+        idx += 1
+    which, name = tokens[idx], tokens[idx + 1]
+    idx = header_colon(tokens, idx + 2)
+    following = tokens.tokens[idx + 1:idx + 5]
+    if len(following) < 4:
+        return
+    newline, indent, docstring, end = following
+    if not (newline.type == token.NEWLINE and newline.value == '\n'
+            and indent.type == token.INDENT
+            and docstring.type == token.STRING
+            and end.type == token.NEWLINE):
+        return
+    for error in check_docstring(which, name, docstring):
+        yield error
@@ -2,12 +2,15 @@
 
 from __future__ import unicode_literals
 
+import ast
 import os
 
 from lib2to3.pgen2 import token
 
-from ebb_lint.checkers.registration import register_checker
+from ebb_lint.checkers.registration import (
+    register_ast_checker, register_checker)
 from ebb_lint.errors import Errors
+from ebb_lint.listings import directory_names
 
 
 @register_checker("""
@@ -17,41 +20,90 @@ from ebb_lint.errors import Errors
 | dotted_as_name< pdb='pdb' any* >
 )
 
-""")
+""", errors=[Errors.no_debuggers])
 def check_for_pdb(pdb):
     yield pdb, Errors.no_debuggers, {}
 
 
+@register_ast_checker(['Import', 'ImportFrom'], replaces=check_for_pdb)
+def check_for_pdb_in_ast(node, tokens):
+    idx = tokens.index_of_node(node)
+    if isinstance(node, ast.ImportFrom):
+        if node.module == 'pdb' and not node.level:
+            yield tokens[idx + 1], Errors.no_debuggers, {}
+        return
+    for alias in node.names:
+        idx += 1
+        # A lone 'import pdb' matches, but 'pdb' among other names only does
+        # if it's renamed.
+        if alias.name == 'pdb' and (
+                alias.asname is not None or len(node.names) == 1):
+            yield tokens[idx], Errors.no_debuggers, {}
+        # Skip the rest of the dotted name and the 'as' clause, landing on
+        # the comma before the next name.
+        idx += 2 * alias.name.count('.') + 1
+        if alias.asname is not None:
+            idx += 2
+
+
 @register_checker("""
 
 power< any+ trailer< '.' func='set_trace' > trailer< '(' ')' > >
 
-""")
+""", errors=[Errors.no_debuggers])
 def check_for_set_trace(func):
     yield func, Errors.no_debuggers, {}
 
 
+def is_set_trace_call(node):
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == 'set_trace'
+        and not node.args
+        and not node.keywords
+        and not getattr(node, 'starargs', None)
+        and not getattr(node, 'kwargs', None))
+
+
+_decorated = tuple(
+    getattr(ast, name)
+    for name in ['ClassDef', 'FunctionDef', 'AsyncFunctionDef']
+    if hasattr(ast, name))
+
+
+@register_ast_checker(
+    ['Call'], replaces=check_for_set_trace, pass_parent=True)
+def check_for_set_trace_in_ast(node, parent, tokens):
+    if not is_set_trace_call(node):
+        return
+    if isinstance(parent, _decorated) and node in parent.decorator_list:
+        # lib2to3 parses decorators as dotted names, not as expressions.
+        return
+    # Any set_trace() calls on the way to this one come first in the source,
+    # and have to be skipped to find this call's tokens.
+    idx = tokens.index_of_node(node)
+    for subnode in ast.walk(node.func.value):
+        if is_set_trace_call(subnode):
+            idx = tokens.find(idx, '.', 'set_trace', '(', ')') + 4
+    idx = tokens.find(idx, '.', 'set_trace', '(', ')')
+    # lib2to3 only matches if the call is the last thing in its expression.
+    if tokens[idx + 4].value in {'.', '(', '[', '**'}:
+        return
+    yield tokens[idx + 1], Errors.no_debuggers, {}
+
+
 @register_checker("""
 
 f=file_input< any* >
 
-""", comments_for=['f'])
-def scan_top_level_comments(f, f_comments):
+""", errors=[Errors.no_print], comments_for=['f'], pass_context=True)
+def scan_top_level_comments(f, f_comments, context):
     if '# I sincerely swear that this is one-off code.' in f_comments:
-        f.print_lint_ok = True
+        context.set('print_lint_ok', True)
     return []
 
 
-def scan_ancestry_for(node, attr, default):
-    not_set = object()
-    while node is not None:
-        value = getattr(node, attr, not_set)
-        if value is not not_set:
-            return value
-        node = node.parent
-    return default
-
-
 @register_checker("""
 
 ( simple_stmt< any* p='print' any* >
@@ -59,9 +111,9 @@ def scan_ancestry_for(node, attr, default):
 | power< p='print' trailer< '(' any* ')' > any* >
 )
 
-""")
-def check_for_print(p):
-    if scan_ancestry_for(p, 'print_lint_ok', False):
+""", errors=[Errors.no_print], pass_context=True)
+def check_for_print(p, context):
+    if context.get('print_lint_ok', False):
         return
     yield p, Errors.no_print, {}
 
@@ -75,6 +127,7 @@ def check_for_print(p):
 )
 
     """,
+    errors=[Errors.no_implicit_relative_imports],
     pass_filename=True, pass_future_features=True,
     python_disabled_version=(3, 0))
 def check_for_implicit_relative_imports(
@@ -82,30 +135,42 @@ def check_for_implicit_relative_imports(
     if 'absolute_import' in future_features:
         return
     [mod] = mod
-    dirname = os.path.dirname(filename)
     segments = [l.value for l in mod.pre_order() if l.type == token.NAME]
-    candidates = []
-    candidates.extend(
-        os.path.join(dirname,
-                     *(segments[:-1] + ['{}.{}'.format(segments[-1], ext)]))
+    # The module is looked for in directory listings shared by every import
+    # in every file, rather than by stat()ing every path it could be at. Each
+    # directory on the way is only listed if its parent's listing has it.
+    directory = os.path.dirname(filename)
+    names = directory_names(directory)
+    for segment in segments[:-1]:
+        if segment not in names:
+            return
+        directory = os.path.join(directory, segment)
+        names = directory_names(directory)
+    found = any(
+        '{}.{}'.format(segments[-1], ext) in names
         for ext in ['py', 'pyc', 'pyo', 'pyd', 'so'])
-    candidates.extend(
-        os.path.join(dirname, *(segments + ['__init__.{}'.format(ext)]))
-        for ext in ['py', 'pyc', 'pyo'])
-    if not any(os.path.exists(candidate) for candidate in candidates):
+    if not found and segments[-1] in names:
+        names = directory_names(os.path.join(directory, segments[-1]))
+        found = any(
+            '__init__.{}'.format(ext) in names
+            for ext in ['py', 'pyc', 'pyo'])
+    if not found:
         return
 
     node = next(mod.post_order())
     yield node, Errors.no_implicit_relative_imports, {}
 
 
-@register_checker("""
+@register_checker(
+    """
 
 ( classdef< which='class' any* >
 | funcdef< which='def' any* >
 )
 
-""", pass_filename=True)
+    """,
+    errors=[Errors.no_definition_statements_in_dunder_init],
+    pass_filename=True)
 def check_disallowed_dunder_init_statements(filename, which):
     if os.path.basename(filename) != '__init__.py':
         return
@@ -125,7 +190,7 @@ def check_disallowed_dunder_init_statements(filename, which):
             suite< any* simple_stmt< p='pass' any > any* > >
 )
 
-""")
+""", errors=[Errors.useless_pass])
 def check_useless_pass(p):
     yield p, Errors.useless_pass, {}
 
@@ -136,7 +201,7 @@ try_stmt< 'try' any+ 'except' ':'
           suite< any* simple_stmt< p='pass' any > any* >
           any* >
 
-""")
+""", errors=[Errors.no_except_pass])
 def check_except_pass(p):
     yield p, Errors.no_except_pass, {}
 
@@ -151,7 +216,7 @@ def check_except_pass(p):
 | print_stmt< stmt='print' atom< lparen='(' any* ')' > >
 )
 
-""")
+""", errors=[Errors.useless_parens])
 def check_useless_parens(stmt, lparen):
     if lparen.prefix:
         return
@@ -162,7 +227,7 @@ def check_useless_parens(stmt, lparen):
 
 yield_expr< stmt='yield' yield_arg< 'from' atom< lparen='(' any* ')' > > >
 
-""", python_minimum_version=(3, 4, 1))
+""", errors=[Errors.useless_parens], python_minimum_version=(3, 4, 1))
 def check_useless_parens_on_yield_from(stmt, lparen):  # ✘py27 ✘py33
     if lparen.prefix:
         return
@@ -173,7 +238,7 @@ def check_useless_parens_on_yield_from(stmt, lparen):  # ✘py27 ✘py33
 
 simple_stmt < power< f=('map' | 'filter') trailer< '(' any* ')' > any* > any* >
 
-""")
+""", errors=[Errors.no_side_effects])
 def check_no_side_effects_function(f):
     [f] = f
     yield f, Errors.no_side_effects, {'thing': f.value}
@@ -191,7 +256,7 @@ simple_stmt< ( atom< start='[' listmaker< any+ comp_for< any+ > > ']' >
              | atom< start='{' dictsetmaker< any+ comp_for< any+ > > '}' >
              ) any* >
 
-""")
+""", errors=[Errors.no_side_effects])
 def check_no_side_effects_literal(start):
     yield start, Errors.no_side_effects, {'thing': _expr_type[start.value]}
 
@@ -202,21 +267,65 @@ power< f=('map' | 'filter') trailer< '(' arglist<
     lambdef ',' any*
 > any* ')' > any* >
 
-""")
+""", errors=[Errors.no_map_or_filter_with_lambda])
 def check_no_map_or_filter_with_lambda(f):
     [f] = f
     yield f, Errors.no_map_or_filter_with_lambda, {'func': f.value}
 
 
+@register_ast_checker(['Call'], replaces=check_no_map_or_filter_with_lambda)
+def check_no_map_or_filter_with_lambda_in_ast(node, tokens):
+    func = node.func
+    if not (isinstance(func, ast.Name)
+            and func.id in {'map', 'filter'}
+            and node.args
+            and isinstance(node.args[0], ast.Lambda)):
+        return
+    idx = tokens.index_of_node(func)
+    # The name has to be called directly (not awaited or parenthesized), and
+    # the lambda has to be unparenthesized and followed by a comma.
+    if idx and tokens[idx - 1].value == 'await':
+        return
+    if tokens[idx + 1].value != '(' or tokens[idx + 2].value != 'lambda':
+        return
+    depth = 0
+    for tok in tokens.tokens[idx + 2:tokens.matching_close(idx + 1)]:
+        if tok.value in {'(', '[', '{'}:
+            depth += 1
+        elif tok.value in {')', ']', '}'}:
+            depth -= 1
+        elif depth == 0 and tok.value == ',':
+            break
+    else:
+        return
+    yield tokens[idx], Errors.no_map_or_filter_with_lambda, {
+        'func': func.id}
+
+
 @register_checker("""
 
 decorator< at='@' 'staticmethod' any* >
 
-""")
+""", errors=[Errors.no_staticmethod_decorator])
 def check_no_staticmethod_decorator(at):
     yield at, Errors.no_staticmethod_decorator, {}
 
 
+@register_ast_checker(
+    ['ClassDef', 'FunctionDef', 'AsyncFunctionDef'],
+    replaces=check_no_staticmethod_decorator)
+def check_no_staticmethod_decorator_in_ast(node, tokens):
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Call):
+            decorator = decorator.func
+        if not (isinstance(decorator, ast.Name)
+                and decorator.id == 'staticmethod'):
+            continue
+        idx = tokens.index_of_node(decorator)
+        if tokens[idx - 1].value == '@':
+            yield tokens[idx - 1], Errors.no_staticmethod_decorator, {}
+
+
 # XXX: There's a bit of uncovered code below, but it's really just because I'm
 # coding defensively. I don't know if it's possible to get lib2to3 to emit an
 # AST that's in this particular shape, but I don't want to get caught offguard
@@ -244,7 +353,7 @@ def parenthesized_group_leaves(container):
 
 atom=atom< first_string=STRING STRING+ >
 
-""")
+""", errors=[Errors.no_unintentional_implicit_concatenation])
 def check_for_unintentional_implicit_concatenation(atom, first_string):
     try:
         for child in parenthesized_group_leaves(atom.parent):
@@ -1,15 +1,12 @@
 from __future__ import unicode_literals
 
-from lib2to3.pygram import python_symbols
-
-from six.moves import reduce
-
 from ebb_lint.checkers.registration import register_checker
 from ebb_lint.errors import Errors
+from ebb_lint.grammars import load_pygram
+from ebb_lint.traversal import last_leaf
 
 
-def last(seq):
-    return reduce(lambda l, r: r, seq)
+python_symbols = load_pygram().python_symbols
 
 
 @register_checker("""
@@ -19,14 +16,14 @@ def last(seq):
 | atom< '{' contents=any+ end='}' >
 )
 
-""")
+""", errors=[Errors.no_trailing_comma_in_literal])
 def check_trailing_commas(end, contents):
     last_element = contents[-1]
     if (last_element.children
             and last_element.children[-1].type == python_symbols.comp_for):
         # It's a comprehension, so ignore it.
         return
-    last_element_leaf = last(last_element.pre_order())
+    last_element_leaf = last_leaf(last_element)
     if last_element_leaf.value == ',':
         return
     if end.value == ')' and (
@@ -1,10 +1,44 @@
 import venusian
 
 
-def register_checker(pattern, **extra):
+def register_checker(pattern, errors=None, **extra):
+    """
+    Register a checker that runs on lib2to3 nodes matching ``pattern``.
+
+    ``errors`` are the ``Errors`` the checker can report. If every one of
+    them is deselected, the checker isn't run at all; a checker which doesn't
+    say is always run.
+
+    With ``pass_context=True``, the checker is also passed the traversal's
+    ``Context``. With ``on_exit=True``, the checker is called once the
+    traversal is done with the matched node's subtree, instead of before.
+    """
+    if errors is not None:
+        extra['errors'] = frozenset(errors)
+
     def deco(func):
         def callback(scanner, name, obj):
             scanner.register(pattern, obj, extra)
         venusian.attach(func, callback)
         return func
     return deco
+
+
+def register_ast_checker(node_types, replaces, **extra):
+    """
+    Register a checker that runs on the stdlib ``ast`` instead of lib2to3.
+
+    ``node_types`` names the ``ast`` classes the checker is called with; names
+    the running python doesn't have are skipped. ``replaces`` is the lib2to3
+    checker this one stands in for when the hybrid backend is in use, which
+    must report exactly the same errors at exactly the same positions.
+
+    The checker is called with ``node`` and ``tokens``, the file's
+    ``TokenTable``, and yields ``(token, error, kw)`` like any other checker.
+    """
+    def deco(func):
+        def callback(scanner, name, obj):
+            scanner.register_ast(node_types, replaces, obj, extra)
+        venusian.attach(func, callback)
+        return func
+    return deco
@@ -0,0 +1,192 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import gc
+import multiprocessing
+import optparse
+import os
+import sys
+
+import pycodestyle
+from concurrent import futures
+
+from ebb_lint.errors import Errors, error_code
+from ebb_lint.flake8 import EbbLint, driver_for_grammar
+from ebb_lint.grammars import load_pygram
+
+
+# Directories which never have anything worth linting in them.
+_skipped_directories = frozenset([
+    '.bzr', '.git', '.hg', '.svn', '.tox', 'CVS', '__pycache__'])
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # ✘py33 ✘py34 ✘py35
+        return multiprocessing.cpu_count()
+
+
+def make_parser():
+    parser = optparse.OptionParser(
+        usage='%prog [options] path ...',
+        description=(
+            "Lint python files with ebb-lint's checks alone. Directories are "
+            'searched for python files.'))
+    # EbbLint.add_options also says which options can be read from flake8's
+    # configuration, which doesn't apply here.
+    parser.config_options = []
+    parser.add_option('--max-line-length', default=pycodestyle.MAX_LINE_LENGTH,
+                      type=int, metavar='n',
+                      help='maximum line length allowed, unless bulky')
+    EbbLint.add_options(parser)
+    parser.add_option('--select', default='', metavar='codes', help=(
+        'comma-separated error codes, or prefixes of them, to report; '
+        'defaults to all of them'))
+    parser.add_option('--ignore', default='', metavar='codes', help=(
+        'comma-separated error codes, or prefixes of them, not to report'))
+    parser.add_option('-j', '--jobs', default=available_cores(), type=int,
+                      metavar='n', help=(
+                          'number of processes to lint with; defaults to the '
+                          'number of available cores'))
+    return parser
+
+
+def find_files(paths):
+    """
+    Yield the python files among ``paths``, and in the directories among
+    them, in a consistent order.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(
+                name for name in dirnames if name not in _skipped_directories)
+            for name in sorted(filenames):
+                if name.endswith('.py'):
+                    yield os.path.join(dirpath, name)
+
+
+def _codes(value):
+    return tuple(code.strip() for code in value.split(',') if code.strip())
+
+
+def lint_options(values):
+    """
+    Turn the parsed options into the options EbbLint is set up with.
+
+    Only plain values go into ``values``, so that they can be sent to other
+    processes; which errors are enabled is worked out from them here.
+    """
+    options = optparse.Values(values)
+    select = _codes(options.select)
+    ignore = _codes(options.ignore)
+    options.ignore = ignore
+    enabled = frozenset(
+        error_code(error) for error in Errors
+        if (not select or error_code(error).startswith(select))
+        and not error_code(error).startswith(ignore))
+    options.ignore_code = lambda code: code not in enabled
+    return options
+
+
+# The options each process has set EbbLint up with, so that it's only done
+# once per process.
+_worker_values = None
+
+
+def set_up(values):
+    global _worker_values
+    if values != _worker_values:
+        EbbLint.parse_options(lint_options(values))
+        _worker_values = values
+
+
+def warm_up(values):
+    """
+    Set EbbLint up in this process, along with everything else linting needs
+    that isn't loaded until the first file is linted. Workers forked from
+    this process afterward share all of it instead of building their own.
+    """
+    set_up(values)
+    pygram = load_pygram()
+    driver_for_grammar(pygram.python_grammar)
+    driver_for_grammar(pygram.python_grammar_no_print_statement)
+    # Stop the garbage collector from writing to, and so copying, every
+    # object the workers inherit.
+    freeze = getattr(gc, 'freeze', None)
+    if freeze is not None:  # pragma: nocover
+        freeze()
+
+
+def lint_file(values, filename):
+    set_up(values)
+    try:
+        return [
+            (filename, lineno, column, message)
+            for lineno, column, message, _ in EbbLint(None, filename).run()]
+    except Exception as e:
+        # Reported the way pycodestyle reports a file it can't check, which
+        # also means the exception itself is never sent back from another
+        # process; not every exception can be, and the ones which can't
+        # leave the process pool stuck.
+        return [(filename, 1, 0, 'E902 {}: {}'.format(type(e).__name__, e))]
+
+
+def process_pool(jobs):
+    """
+    Return a process pool with ``jobs`` workers, which are forked from this
+    process wherever that can be asked for, since they only share what
+    ``warm_up`` loaded if they are.
+    """
+    kwargs = {}
+    if sys.version_info >= (3, 7):  # pragma: nocover
+        if 'fork' in multiprocessing.get_all_start_methods():
+            kwargs['mp_context'] = multiprocessing.get_context('fork')
+    return futures.ProcessPoolExecutor(max_workers=jobs, **kwargs)
+
+
+def lint_files(values, filenames, jobs, warm_parent=True):
+    """
+    Lint every file, with ``jobs`` processes, and return all of their errors
+    sorted by file and position.
+
+    Unless ``warm_parent`` is false, this process is warmed up before the
+    worker processes are started, rather than each worker setting itself up.
+    """
+    if jobs <= 1:
+        results = [lint_file(values, filename) for filename in filenames]
+    else:
+        if warm_parent:
+            warm_up(values)
+        with process_pool(jobs) as executor:
+            pending = executor.map(
+                lint_file, [values] * len(filenames), filenames)
+            # Submitting the first file started every worker, so what
+            # warm_up froze can go back to being collected.
+            unfreeze = getattr(gc, 'unfreeze', None)
+            if warm_parent and unfreeze is not None:  # pragma: nocover
+                unfreeze()
+            results = list(pending)
+    return sorted(error for errors in results for error in errors)
+
+
+def main(argv=None):
+    parser = make_parser()
+    options, paths = parser.parse_args(argv)
+    if not paths:
+        parser.error('no paths to lint')
+    values = dict(vars(options))
+    jobs = values.pop('jobs')
+    errors = lint_files(values, list(find_files(paths)), jobs)
+    for filename, lineno, column, message in errors:
+        sys.stdout.write('{}:{}:{}: {}\n'.format(
+            filename, lineno, column + 1, message))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':  # pragma: nocover
+    sys.exit(main())
@@ -81,3 +81,10 @@ class Errors(enum.Enum):
     no_noqa = Error(
         303,
         'noqa is ignored, so this comment is not useful')
+
+
+def error_code(error):
+    """
+    Return the code flake8 reports an error under, like ``L201``.
+    """
+    return 'L{:03d}'.format(error.value.code)
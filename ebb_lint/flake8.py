@@ -2,20 +2,33 @@
 
 from __future__ import unicode_literals
 
+import array
+import ast
 import bisect
-import io
+import functools
+import hashlib
+import json
+import mmap
+import os
+import platform
+import re
 import sys
 from lib2to3.pgen2 import driver, token, tokenize
-from lib2to3 import patcomp, pygram, pytree
+from lib2to3 import pytree
 
 import pycodestyle
 import six
-import venusian
-from intervaltree import Interval, IntervalTree
 
+from ebb_lint import grammars, listings
 from ebb_lint._version import __version__
-from ebb_lint.errors import Errors
-from ebb_lint import checkers
+from ebb_lint.cache import LRUStore, default_cache_dir
+from ebb_lint.errors import Errors, error_code
+from ebb_lint.grammars import load_pygram
+from ebb_lint.matchers import BottomMatcher, index_checkers, subtree_types
+from ebb_lint.registry import collect_checkers
+from ebb_lint.tokens import TokenTable
+from ebb_lint.traversal import Context, Walker, first_leaf
+from ebb_lint.trees import deserialize_tree, serialize_tree
 
 
 _pycodestyle_noqa = pycodestyle.noqa
@@ -23,16 +36,6 @@ _pycodestyle_noqa = pycodestyle.noqa
 pycodestyle.noqa = lambda ign: False
 
 
-def tokenize_source_string(s, base_byte=0):
-    fobj = io.StringIO(six.text_type(s).rstrip(' \t\r\n\\'))
-    lines = Lines(fobj)
-    fobj.seek(0)
-    for typ, tok, spos, epos, _ in tokenize.generate_tokens(fobj.readline):
-        yield typ, tok, Interval(
-            lines.byte_of_pos(*spos) + base_byte,
-            lines.byte_of_pos(*epos) + base_byte)
-
-
 # detect_future_features isn't fully covered, but I don't really care, because
 # I don't want to rewrite it. Maybe if it becomes more relevant I'll pull it
 # out of this suite and actually properly unit test it, but right now I feel
@@ -40,9 +43,9 @@ def tokenize_source_string(s, base_byte=0):
 # enough to do anything else. It's stolen from lib2to3 directly. Why was this a
 # private function? Ugh.
 
-def detect_future_features(s):  # pragma: nocover
+def detect_future_features(tokens):  # pragma: nocover
     have_docstring = False
-    gen = tokenize_source_string(s)
+    gen = iter(tokens)
 
     def advance():
         tok = next(gen)
@@ -84,65 +87,188 @@ def detect_future_features(s):  # pragma: nocover
 
 if six.PY3:  # ✘py27
     def grammar_for_future_features(future_features):
-        return pygram.python_grammar_no_print_statement
+        return load_pygram().python_grammar_no_print_statement
 
 else:  # ✘py33 ✘py34 ✘py35
     def grammar_for_future_features(future_features):
+        pygram = load_pygram()
         if 'print_function' in future_features:
             return pygram.python_grammar_no_print_statement
         else:
             return pygram.python_grammar
 
 
-def find_comments(s, base_byte=0):
-    for typ, tok, interval in tokenize_source_string(s, base_byte=base_byte):
-        if typ == tokenize.COMMENT:
-            yield tok, interval
+# lib2to3's Driver holds no per-parse state of its own (parse_tokens builds
+# a fresh Parser for every call), so one Driver per grammar can be shared by
+# every file linted in this process instead of being rebuilt each time.
+_drivers = {}
+
+
+def driver_for_grammar(grammar):
+    d = _drivers.get(grammar)
+    if d is None:
+        d = _drivers[grammar] = driver.Driver(grammar, convert=pytree.convert)
+    return d
+
+
+# Files at least this big are mapped into memory instead of being read.
+_mmap_threshold = 64 * 1024
+
+
+def read_source_bytes(filename):
+    """
+    Read a file's bytes, opening it only once. A big file is mapped, and the
+    ``mmap`` returned in place of the bytes.
+    """
+    with open(filename, 'rb') as infile:
+        if os.fstat(infile.fileno()).st_size < _mmap_threshold:
+            return infile.read()
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _header_lines(data):
+    # The encoding is only ever declared in the first two lines, so nothing
+    # past them is copied out of ``data``.
+    start = 0
+    ret = []
+    for _ in range(2):
+        end = data.find(b'\n', start) + 1 or len(data)
+        ret.append(data[start:end])
+        start = end
+    return ret
+
+
+def source_encoding(data):
+    readline = functools.partial(next, iter(_header_lines(data)))
+    return tokenize.detect_encoding(readline)[0]
 
 
 def decode_string_using_source_encoding(b):
-    encoding = tokenize.detect_encoding(io.BytesIO(b).readline)[0]
-    return b.decode(encoding)
+    return six.text_type(b, source_encoding(b))
+
+
+def decode_file_bytes(data):
+    # Decode the way io.open would have, which turns every line ending into
+    # '\n'.
+    text = six.text_type(data, source_encoding(data))
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
 
 
 def read_file_using_source_encoding(filename):
-    with open(filename, 'rb') as infile:
-        encoding = tokenize.detect_encoding(infile.readline)[0]
-    with io.open(filename, 'r', encoding=encoding) as infile_with_encoding:
-        return infile_with_encoding.read()
+    return decode_file_bytes(read_source_bytes(filename))
+
+
+def source_from_lines(lines):
+    if lines and isinstance(lines[0], six.binary_type):
+        # flake8 reads files as bytes on python 2.
+        return decode_string_using_source_encoding(b''.join(lines))
+    return ''.join(lines)
+
+
+def has_trailing_newline(source):
+    return not source or source.endswith('\n')
+
+
+def parse_source(driver, source, tokens=None):
+    if tokens is None:
+        tokens = TokenTable(source)
+    # The token table has already added the trailing newline lib2to3 needs.
+    return driver.parse_tokens(tokens.stream), has_trailing_newline(source)
+
 
+_coding_declaration = re.compile(r'^([ \t\f]*#.*?)coding([:=])')
 
-def parse_source(driver, source):
-    trailing_newline = not source or source.endswith('\n')
-    # Thanks for this, lib2to3.
-    if not trailing_newline:
-        source += '\n'
-    return driver.parse_string(source), trailing_newline
+# lib2to3 sees f-strings as single string tokens, so nothing inside one can be
+# matched by a lib2to3 checker, and ast checkers must not look inside either.
+_opaque_ast_nodes = tuple(
+    getattr(ast, name) for name in ['JoinedStr'] if hasattr(ast, name))
+
+
+def parse_ast(source):
+    if six.PY2:  # ✘py33 ✘py34 ✘py35
+        # Python 2 refuses to compile unicode source which declares an
+        # encoding. Changing the declaration keeps every position the same.
+        lines = source.split('\n', 2)
+        lines[:2] = [_coding_declaration.sub(r'\1c0ding\2', line)
+                     for line in lines[:2]]
+        source = '\n'.join(lines)
+    try:
+        return ast.parse(source)
+    # Python's own parser runs out of stack on deeply nested source before
+    # lib2to3's does, and (before 3.9) says so with a MemoryError.
+    except (SyntaxError, TypeError, ValueError, MemoryError):
+        return None
+
+
+def source_digest(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def cache_key(*parts):
+    key = json.dumps([
+        __version__,
+        platform.python_implementation(),
+        list(sys.version_info),
+    ] + list(parts))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+# array wants a native string for its typecode on python 2, which has no 'q',
+# but its 'l' is 64 bits wherever longs are.
+_offset_typecode = str('l' if six.PY2 else 'q')
+_count_typecode = str('l')
 
 
 class Lines(object):
-    def __init__(self, infile):
-        count = 0
-        self.lines = [(0, '')]
-        for line in infile:
-            self.lines.append((count, line))
-            count += len(line)
-        self.last_pos = len(self.lines) - 1, len(self.lines[-1][1])
-        self.last_byte = count
+    """
+    Where each line of a source starts, for converting between positions and
+    offsets in the source.
+
+    Lines are numbered from 1, and split the same way the tokenizer splits
+    them: only after newlines, and not on form feeds or the other characters
+    ``str.splitlines`` also splits on. ``starts[lineno]`` is the offset line
+    ``lineno`` starts at, and one past the last line is where the source ends.
+    Only the offsets are kept; the text of a line is sliced out of the source
+    when it's asked for.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        # Line 0 is an empty line before the first.
+        starts = self.starts = array.array(_offset_typecode, [0, 0])
+        offset = 0
+        parts = source.split('\n')
+        for part in parts[:-1]:
+            offset += len(part) + 1
+            starts.append(offset)
+        # Whatever follows the last '\n' is a line with no ending.
+        if parts[-1]:
+            starts.append(len(source))
+        self._n_lines = n_lines = len(starts) - 2
+        self.last_pos = n_lines, starts[-1] - starts[-2]
+        self.last_byte = len(source)
+
+    def __len__(self):
+        # Including line 0.
+        return self._n_lines + 1
 
     def __getitem__(self, idx):
-        return self.lines[idx]
+        if not 0 <= idx <= self._n_lines:
+            raise IndexError(idx)
+        start = self.starts[idx]
+        return start, self.source[start:self.starts[idx + 1]]
 
     def __iter__(self):
-        for e, (count, line) in enumerate(self.lines):
-            if e == 0:
-                continue
-            yield e, count, line
+        starts = self.starts
+        for e in range(1, self._n_lines + 1):
+            yield e, starts[e], self.source[starts[e]:starts[e + 1]]
 
     def position_of_byte(self, byte):
-        lineno = bisect.bisect_left(self.lines, (byte + 1,)) - 1
-        column = byte - self.lines[lineno][0]
-        return lineno, column
+        starts = self.starts
+        lineno = bisect.bisect_right(starts, byte, 0, self._n_lines + 1) - 1
+        return lineno, byte - starts[lineno]
 
     def byte_of_pos(self, lineno, column):
         # This requires a bit of explanation. The source passed to lib2to3's
@@ -151,24 +277,55 @@ class Lines(object):
         # newline. When that extra line is added, the final DEDENT token in the
         # file will have a lineno equal to the lines in the file plus one,
         # becase it's "at" a location that doesn't exist in the real file. If
-        # this case wasn't specifically caught, the self[lineno] would raise an
-        # exception because lineno is beyond the last index in self.lines. So,
-        # when that case is detected, return the final byte position.
-        if lineno == len(self.lines) and column == 0:
+        # this case wasn't specifically caught, looking up lineno would raise
+        # an exception because it's beyond the last line. So, when that case
+        # is detected, return the final byte position.
+        if 0 <= lineno <= self._n_lines:
+            return self.starts[lineno] + column
+        if lineno == self._n_lines + 1 and column == 0:
             return self.last_byte
-        byte, _ = self[lineno]
-        byte += column
-        return byte
+        raise IndexError(lineno)
 
     def byte_of_node(self, node):
         return self.byte_of_pos(node.lineno, node.column)
 
 
-def byte_intersection(tree, lower, upper):
-    ret = 0
-    for i in tree.search(lower, upper):
-        ret += min(i.end, upper) - max(i.begin, lower)
-    return ret
+def bytes_on_line(tok, lineno):
+    """
+    Return how many bytes of a line a token takes up, not counting the line
+    ending if the token runs onto the next line.
+    """
+    if '\n' not in tok.value:
+        return len(tok.value)
+    part = tok.value.split('\n')[lineno - tok.lineno]
+    return len(part.rstrip('\r'))
+
+
+def enabled_codes(options):
+    """
+    Return the codes of every error flake8 would report, or None if flake8
+    hasn't said which it would.
+    """
+    ignore_code = getattr(options, 'ignore_code', None)
+    if ignore_code is None:
+        return None
+    codes = (error_code(error) for error in Errors)
+    return frozenset(code for code in codes if not ignore_code(code))
+
+
+def error_enabled(error, codes):
+    return codes is None or error_code(error) in codes
+
+
+def checker_enabled(extra, codes):
+    """
+    Return whether a checker can report any of ``codes``. Checkers which don't
+    say what they report always can.
+    """
+    errors = extra.get('errors')
+    if errors is None:
+        return True
+    return any(error_enabled(error, codes) for error in errors)
 
 
 class EbbLint(object):
@@ -176,16 +333,41 @@ class EbbLint(object):
     version = __version__
 
     collected_checkers = None
+    _collected_codes = None
+    collected_index = None
+    collected_subtree_types = None
+    collected_ast_checkers = None
+    active_checkers = None
+    active_index = None
+    active_subtree_types = None
+    active_bottom_matcher = None
+    active_ast_checkers = None
+    _result_store = None
+    _tree_store = None
     _source = None
+    # The bytes of the file, or an mmap of them, if it was read from disk.
+    source_bytes = None
     _lines = None
-
-    def __init__(self, tree, filename):
+    tokens = None
+    future_features = None
+    # The lib2to3 tree, if one was parsed.
+    cst = None
+    # When only part of a file is being linted, the context the checkers set
+    # on the whole file's root, which the part's statements inherit.
+    context = None
+    # Once the whole file's tree has been checked, the context the checkers
+    # set on its root.
+    root_context = None
+
+    def __init__(self, tree, filename, lines=None):
         self.tree = tree
         self.filename = filename
-        self._intervals = {
-            'comments': IntervalTree(),
-            'string literals': IntervalTree(),
-        }
+        # flake8 3 passes the lines it has already read and decoded, so
+        # there's no need to open the file again. flake8 2 doesn't.
+        self._provided_lines = lines
+        # How many bytes of each line are comments and string literals, once
+        # they've been counted.
+        self._line_bytes = None
 
     @classmethod
     def add_options(cls, parser):
@@ -199,6 +381,39 @@ class EbbLint(object):
                               'string literals or comments to be allowed to '
                               'pass the soft line limit'))
         parser.config_options.append('permissive-bulkiness-percentage')
+        # Unlike the other options, this can't be set from a project's
+        # configuration, so that linting someone else's checkout can't be
+        # made to read or write files wherever it says.
+        parser.add_option('--ebb-lint-cache-dir', default=default_cache_dir(),
+                          metavar='dir',
+                          help='directory for caching lint results')
+        parser.add_option('--ebb-lint-cache-size', default=50000, type=int,
+                          metavar='n', help=(
+                              'maximum number of files to keep cached '
+                              'results for'))
+        parser.config_options.append('ebb-lint-cache-size')
+        parser.add_option('--no-ebb-lint-cache', action='store_true',
+                          help="don't read or write cached lint results")
+        parser.config_options.append('no-ebb-lint-cache')
+        parser.add_option('--ebb-lint-tree-cache', action='store_true',
+                          help=(
+                              'also cache parse trees, so that files whose '
+                              'results are not cached can skip parsing'))
+        parser.config_options.append('ebb-lint-tree-cache')
+        parser.add_option('--ebb-lint-backend', default='cst',
+                          metavar='backend', help=(
+                              "'cst' runs every check on lib2to3's syntax "
+                              "tree; 'hybrid' runs the checks that can on "
+                              "python's own ast, and only parses with "
+                              "lib2to3 if another enabled check needs it"))
+        parser.config_options.append('ebb-lint-backend')
+        parser.add_option('--ebb-lint-bottom-matcher', action='store_true',
+                          help=(
+                              'find which checks could apply to which parts '
+                              "of the syntax tree with lib2to3's bottom "
+                              'matcher, in one pass up the tree, rather than '
+                              'by the type of each node'))
+        parser.config_options.append('ebb-lint-bottom-matcher')
 
     @classmethod
     def parse_options(cls, options):
@@ -206,33 +421,92 @@ class EbbLint(object):
         # customize how another checker does its checking.
         options.ignore += 'E501',
         cls.options = options
+        # Before the checkers are collected, since some load grammars.
+        if options.no_ebb_lint_cache:
+            grammars.cache_dir = None
+        else:
+            grammars.cache_dir = os.path.join(
+                options.ebb_lint_cache_dir, 'grammars')
+        cls._collect_checkers()
+
+        if options.ebb_lint_backend == 'cst':
+            cls.active_checkers = cls.collected_checkers
+            cls.active_ast_checkers = {}
+        elif options.ebb_lint_backend == 'hybrid':
+            collected = {checker for _, checker, _ in cls.collected_checkers}
+            replaced = set()
+            cls.active_ast_checkers = {}
+            for node_types, replaces, checker, extra in (
+                    cls.collected_ast_checkers):
+                if replaces not in collected:
+                    continue
+                replaced.add(replaces)
+                for node_type in node_types:
+                    cls.active_ast_checkers.setdefault(node_type, []).append(
+                        (checker, extra))
+            cls.active_checkers = [
+                (pattern, checker, extra)
+                for pattern, checker, extra in cls.collected_checkers
+                if checker not in replaced]
+        else:
+            raise ValueError('unknown --ebb-lint-backend {!r}'.format(
+                options.ebb_lint_backend))
+        cls.active_index = index_checkers(cls.active_checkers)
+        cls.active_subtree_types = subtree_types(
+            cls.active_index, load_pygram().python_grammar)
+        if options.ebb_lint_bottom_matcher:
+            cls.active_bottom_matcher = BottomMatcher(cls.active_checkers)
+        else:
+            cls.active_bottom_matcher = None
+
+        if options.no_ebb_lint_cache:
+            cls._result_store = None
+        else:
+            cls._result_store = LRUStore(
+                os.path.join(options.ebb_lint_cache_dir, 'results.sqlite3'),
+                options.ebb_lint_cache_size)
+
+        if options.ebb_lint_tree_cache:
+            cls._tree_store = LRUStore(
+                os.path.join(options.ebb_lint_cache_dir, 'trees.sqlite3'),
+                options.ebb_lint_cache_size)
+        else:
+            cls._tree_store = None
 
+    @classmethod
+    def _collect_checkers(cls):
+        codes = enabled_codes(cls.options)
         # This vastly speeds up the test suite, since parse_options is called
-        # on every test now, and venusian does a lot of work.
-        if cls.collected_checkers is not None:
+        # on every test now, and collecting checkers does a lot of work.
+        if (cls.collected_checkers is not None
+                and cls._collected_codes == codes):
             return
 
-        collected_checkers = []
-
-        def register_checker(pattern, checker, extra):
-            if ('python_minimum_version' in extra
-                    and sys.version_info < extra['python_minimum_version']):
-                return
-            if ('python_disabled_version' in extra
-                    and sys.version_info > extra['python_disabled_version']):
-                return
-            pattern = patcomp.compile_pattern(pattern)
-            collected_checkers.append((pattern, checker, extra))
-
-        scanner = venusian.Scanner(register=register_checker)
-        scanner.scan(checkers)
+        # The registry is never kept in --ebb-lint-cache-dir; see registry.
+        collected_checkers, collected_ast_checkers = collect_checkers(
+            None if cls.options.no_ebb_lint_cache else default_cache_dir(),
+            codes)
+        # A checker none of whose errors would be reported isn't worth
+        # matching against every node.
+        collected_checkers = [
+            (matcher, checker, extra)
+            for matcher, checker, extra in collected_checkers
+            if checker_enabled(extra, codes)]
+        cls._collected_codes = codes
         cls.collected_checkers = collected_checkers
+        cls.collected_index = index_checkers(collected_checkers)
+        cls.collected_subtree_types = subtree_types(
+            cls.collected_index, load_pygram().python_grammar)
+        cls.collected_ast_checkers = collected_ast_checkers
 
     @property
     def source(self):
         if self._source is None:
-            if self.filename != 'stdin':
-                self._source = read_file_using_source_encoding(self.filename)
+            if self._provided_lines is not None:
+                self._source = source_from_lines(self._provided_lines)
+            elif self.filename != 'stdin':
+                self.source_bytes = read_source_bytes(self.filename)
+                self._source = decode_file_bytes(self.source_bytes)
             elif six.PY2:  # ✘py33 ✘py34 ✘py35
                 # On python 2, reading from stdin gives you bytes, which must
                 # be decoded.
@@ -246,7 +520,7 @@ class EbbLint(object):
     @property
     def lines(self):
         if self._lines is None:
-            self._lines = Lines(self.source.splitlines(True))
+            self._lines = Lines(self.source)
         return self._lines
 
     def _message_for_node(self, node, error, **kw):
@@ -261,88 +535,321 @@ class EbbLint(object):
 
     def _message_for_pos(self, pos, error, **kw):
         lineno, column = pos
-        message = 'L{:03d} {}'.format(
-            error.value.code, error.value.message.format(**kw))
+        message = '{} {}'.format(
+            error_code(error), error.value.message.format(**kw))
         return lineno, column, message, type(self)
 
+    def _result_cache_key(self):
+        options = self.options
+        checkers = sorted(
+            '{}.{}'.format(checker.__module__, checker.__name__)
+            for _, checker, _ in self.collected_checkers)
+        return cache_key(
+            options.max_line_length,
+            options.hard_max_line_length,
+            options.permissive_bulkiness_percentage,
+            checkers,
+            # Disabled errors aren't looked for at all, so they aren't in the
+            # results either.
+            None if self._collected_codes is None
+            else sorted(self._collected_codes),
+            # Some checkers look at the file's name or its neighbours, so the
+            # same source can lint differently at a different path. Which
+            # neighbours were looked at is stored with the results.
+            self.filename,
+            'with directories',
+            source_digest(self.source))
+
     def run(self):
-        self.future_features = detect_future_features(self.source)
-        d = driver.Driver(
-            grammar_for_future_features(self.future_features),
-            convert=pytree.convert)
-        tree, trailing_newline = parse_source(d, self.source)
-        if not trailing_newline:
+        store = self._result_store
+        if store is None:
+            for error in self._run_uncached():
+                yield error
+            return
+
+        key = self._result_cache_key()
+        cached = store.get(key)
+        if cached is not None:
+            cached = json.loads(cached.decode('utf-8'))
+            # Results which depended on what was in some directories are only
+            # good as long as nothing has been added to or removed from them.
+            if listings.unchanged(cached['directories']):
+                for lineno, column, message in cached['errors']:
+                    yield lineno, column, message, type(self)
+                return
+
+        errors = list(self._run_uncached())
+        store.put(key, json.dumps({
+            'directories': listings.checked_directories(),
+            'errors': [
+                [lineno, column, message]
+                for lineno, column, message, _ in errors],
+        }).encode('utf-8'))
+        for error in errors:
+            yield error
+
+    def _parse(self):
+        grammar = grammar_for_future_features(self.future_features)
+        store = self._tree_store
+        if store is None:
+            return parse_source(
+                driver_for_grammar(grammar), self.source, self.tokens)
+
+        key = cache_key(
+            'print' in grammar.keywords, source_digest(self.source))
+        data = store.get(key)
+        if data is not None:
+            return deserialize_tree(data), has_trailing_newline(self.source)
+
+        tree, trailing_newline = parse_source(
+            driver_for_grammar(grammar), self.source, self.tokens)
+        store.put(key, serialize_tree(tree))
+        return tree, trailing_newline
+
+    def _run_uncached(self):
+        # The directories checkers look in might have changed since the last
+        # file was linted.
+        listings.recheck()
+        # Everything from here on reads the source's tokens from this table
+        # rather than tokenizing the source (or parts of it) again.
+        self.tokens = TokenTable(self.source)
+        if self.future_features is None:
+            self.future_features = detect_future_features(self.tokens)
+        checkers = self.active_checkers
+        index = self.active_index
+        types = self.active_subtree_types
+        bottom_matcher = self.active_bottom_matcher
+        module = None
+        if self.active_ast_checkers:
+            module = parse_ast(self.source)
+            if module is None:
+                # lib2to3 accepts some python 2 syntax that ast won't, so let
+                # it have a go at running everything instead.
+                checkers = self.collected_checkers
+                index = self.collected_index
+                types = self.collected_subtree_types
+                bottom_matcher = None
+
+        tree = None
+        # With every lib2to3 checker deselected or replaced, there's no need
+        # for a lib2to3 tree at all.
+        if checkers:
+            tree, trailing_newline = self._parse()
+        else:
+            trailing_newline = has_trailing_newline(self.source)
+        if not trailing_newline and error_enabled(
+                Errors.no_trailing_newline, self._collected_codes):
             yield self._message_for_pos(
                 self.lines.last_pos, Errors.no_trailing_newline)
 
-        for error in self._check_tree(tree):
-            yield error
+        long_lines = []
+        if error_enabled(Errors.line_too_long, self._collected_codes):
+            long_lines = self._find_long_lines()
+        # Only a line between the soft and hard limits can be let off for
+        # being mostly comments or string literals, so those are the only
+        # lines they're counted on. Most files don't have any.
+        hard_limit = self.options.hard_max_line_length
+        bulky_lines = [
+            lineno for lineno, length in long_lines if length <= hard_limit]
+        if bulky_lines:
+            self._count_line_bytes(self.tokens, bulky_lines)
+        if error_enabled(Errors.no_noqa, self._collected_codes):
+            for error in self._find_noqa(self.tokens):
+                yield error
 
-        for error in self._check_line_lengths():
-            yield error
+        if tree is not None:
+            self.cst = tree
+            for error in self._check_tree(
+                    tree, index, bottom_matcher, types):
+                yield error
+
+        if module is not None:
+            for error in self._check_ast(module, self.tokens):
+                yield error
 
-    def _check_tree(self, tree):
-        for node in tree.pre_order():
-            for error in self._scan_node_for_ranges(node):
+        if long_lines:
+            for error in self._check_line_lengths(long_lines):
                 yield error
 
-            for pattern, checker, extra in self.collected_checkers:
+    def _check_ast(self, module, tokens):
+        stack = [(module, None)]
+        while stack:
+            node, parent = stack.pop()
+            for checker, extra in self.active_ast_checkers.get(
+                    type(node), ()):
+                kw = {'node': node, 'tokens': tokens}
+                if extra.get('pass_parent', False):
+                    kw['parent'] = parent
+                if extra.get('pass_filename', False):
+                    kw['filename'] = self.filename
+                if extra.get('pass_future_features', False):
+                    kw['future_features'] = self.future_features
+                for error_node, error, kw in checker(**kw):
+                    yield self._message_for_node(error_node, error, **kw)
+            if not isinstance(node, _opaque_ast_nodes):
+                stack.extend(
+                    (child, node)
+                    for child in reversed(list(ast.iter_child_nodes(node))))
+
+    def _check_tree(self, tree, index, bottom_matcher=None, types=None):
+        by_type, any_type = index
+        if self.context is None:
+            nodes = [tree]
+        else:
+            # Checkers which look at the file as a whole only see the whole
+            # file, so they aren't run on a part of it; what they set on the
+            # file's root is inherited instead.
+            nodes = tree.children
+        candidates = None
+        if self.context is None and bottom_matcher is not None:
+            candidates = {
+                id(node): node_checkers
+                for node, node_checkers in bottom_matcher.run(tree)}
+
+        context = Context(self.context or ())
+        if self.context is None:
+            # In case the root is skipped, having nothing to check.
+            self.root_context = context.flags()
+        # The subtree of a node no checker could match anything in is
+        # skipped entirely. Comments and string literals are found in the
+        # tokens, not the tree, so skipping doesn't lose any of them.
+        walker = Walker(nodes, types)
+        for node, exiting in walker:
+            if exiting is context:
+                context.exit()
+                continue
+            elif exiting is not None:
+                checker, results = exiting
+                for error in self._run_checker(checker, results):
+                    yield error
+                continue
+
+            # The context is only entered for a node, and so only has to be
+            # exited, if a checker on that node is passed it.
+            entered = False
+            if candidates is None:
+                node_checkers = by_type.get(node.type, any_type)
+            else:
+                node_checkers = candidates.get(id(node), ())
+            for matcher, checker, extra in node_checkers:
                 results = {}
-                if not pattern.match(node, results):
+                if not matcher.match(node, results):
                     continue
                 for k in extra.get('comments_for', ()):
                     # XXX: this doesn't use `k` for finding the node; `k` is
                     # supposed to name a specific node, but it isn't used when
                     # choosing which node is added to results.
-                    results[k + '_comments'] = [
-                        c for c, _ in find_comments(node.prefix)]
+                    results[k + '_comments'] = self._comments_for(node)
                 if extra.get('pass_filename', False):
                     results['filename'] = self.filename
                 if extra.get('pass_future_features', False):
                     results['future_features'] = self.future_features
-                for error_node, error, kw in checker(**results):
-                    yield self._message_for_node(error_node, error, **kw)
-
-    def _scan_node_for_ranges(self, node):
-        if node.children or (node.type != token.STRING and not node.prefix):
+                if extra.get('pass_context', False):
+                    if not entered:
+                        context.enter()
+                        walker.on_exit(node, context)
+                        entered = True
+                    results['context'] = context
+                if extra.get('on_exit', False):
+                    walker.on_exit(node, (checker, results))
+                    continue
+                for error in self._run_checker(checker, results):
+                    yield error
+            if node is tree:
+                self.root_context = context.flags()
+
+    def _run_checker(self, checker, results):
+        for error_node, error, kw in checker(**results):
+            yield self._message_for_node(error_node, error, **kw)
+
+    def _comments_for(self, node):
+        if not node.prefix:
+            return []
+        leaf = first_leaf(node)
+        byte = self.lines.byte_of_node(leaf)
+        start = self.lines.position_of_byte(byte - len(node.prefix))
+        return [
+            c.value for c in self.tokens.comments_between(
+                start, (leaf.lineno, leaf.column))]
+
+    def _count_line_bytes(self, tokens, bulky_lines):
+        n_lines = len(self.lines)
+        strings = array.array(_count_typecode, [0]) * n_lines
+        comments = array.array(_count_typecode, [0]) * n_lines
+        self._line_bytes = {
+            'comments': comments,
+            'string literals': strings,
+        }
+        if len(bulky_lines) * 10 > n_lines:
+            # With this many lines to count, it's cheaper to count every line
+            # in one pass over all of the tokens.
+            for tok in tokens:
+                if tok.type == token.STRING:
+                    for lineno in range(tok.lineno, tok.end[0] + 1):
+                        strings[lineno] += bytes_on_line(tok, lineno)
+            for tok in tokens.comments:
+                comments[tok.lineno] += len(tok.value)
             return
 
-        byte = self.lines.byte_of_node(node)
-
-        if node.type == token.STRING:
-            self._intervals['string literals'].add(Interval(
-                byte, byte + len(node.value)))
-
-        comments = list(
-            find_comments(node.prefix, byte - len(node.prefix)))
-        for c, i in comments:
-            self._intervals['comments'].add(i)
-            m = _pycodestyle_noqa(c)
+        # Otherwise, the string literals and comments on each line are found
+        # by bisecting the tokens, so none of the others are looked at.
+        for lineno in bulky_lines:
+            idx = tokens.index_at(lineno, 0)
+            # A string can start on an earlier line and run onto this one.
+            if idx > 0 and tokens[idx - 1].end[0] >= lineno:
+                idx -= 1
+            while idx < len(tokens) and tokens[idx].lineno <= lineno:
+                tok = tokens[idx]
+                if tok.type == token.STRING:
+                    strings[lineno] += bytes_on_line(tok, lineno)
+                idx += 1
+            for tok in tokens.comments_between((lineno, 0), (lineno + 1, 0)):
+                comments[lineno] += len(tok.value)
+
+    def _find_noqa(self, tokens):
+        for tok in tokens.comments:
+            m = _pycodestyle_noqa(tok.value)
             if m is not None:
                 yield self._message_for_pos(
-                    self.lines.position_of_byte(i.begin + m.start()),
-                    Errors.no_noqa)
+                    (tok.lineno, tok.column + m.start()), Errors.no_noqa)
 
-    def _check_line_lengths(self):
+    def _find_long_lines(self):
+        """
+        Return the number and length of every line over the soft limit.
+        """
+        soft_limit = self.options.max_line_length
+        lines = self.lines
+        source = lines.source
+        starts = lines.starts
+        ret = []
+        for lineno in range(1, len(lines)):
+            start, end = starts[lineno], starts[lineno + 1]
+            # A line ending only makes the line look longer, so only a line
+            # which looks too long needs its line ending taken off.
+            if end - start <= soft_limit:
+                continue
+            while end > start and source[end - 1] in '\r\n':
+                end -= 1
+            if end - start > soft_limit:
+                ret.append((lineno, end - start))
+        return ret
+
+    def _check_line_lengths(self, long_lines):
         soft_limit = self.options.max_line_length
         hard_limit = self.options.hard_max_line_length
         permitted_percentage = self.options.permissive_bulkiness_percentage
-        for lineno, line_start, line in self.lines:
-            line = line.rstrip('\r\n')
-            if len(line) <= soft_limit:
-                continue
-            if len(line) > hard_limit:
+        for lineno, length in long_lines:
+            if length > hard_limit:
                 yield self._message_for_pos(
                     (lineno, hard_limit), Errors.line_too_long,
-                    length=len(line), which_limit='hard', limit=hard_limit,
+                    length=length, which_limit='hard', limit=hard_limit,
                     extra='')
                 continue
 
-            line_end = line_start + len(line)
             percentages = {}
-            for name, i in self._intervals.items():
-                n_bytes = byte_intersection(i, line_start, line_end)
-                percentages[name] = p = n_bytes * 100 // len(line)
+            for name, counts in self._line_bytes.items():
+                n_bytes = counts[lineno]
+                percentages[name] = p = n_bytes * 100 // length
                 assert 0 <= p <= 100, 'line percentage not in range'
 
             if any(p >= permitted_percentage for p in percentages.values()):
@@ -353,5 +860,5 @@ class EbbLint(object):
                 for name, p in percentages.items())
             yield self._message_for_pos(
                 (lineno, soft_limit), Errors.line_too_long,
-                length=len(line), which_limit='soft', limit=soft_limit,
+                length=length, which_limit='soft', limit=soft_limit,
                 extra=extra)
@@ -0,0 +1,130 @@
+from __future__ import unicode_literals
+
+import errno
+import hashlib
+import marshal
+import os
+import sys
+from lib2to3.pgen2 import driver, grammar
+
+from ebb_lint.cache import default_cache_dir
+
+
+# lib2to3 builds its grammars when lib2to3.pygram is imported, from pickles
+# which are slow to load on python 2, and which some installs don't have at
+# all, leaving lib2to3 to regenerate the grammars from scratch every time.
+# Instead, ebb-lint ships the same tables as marshal data, which loads in a
+# fraction of the time. Tables are named after a digest of the grammar source
+# they were built from, so they're only ever used for exactly that grammar;
+# for any other grammar, lib2to3 builds it as usual, and the tables are saved
+# to the cache directory for next time.
+
+tables_dir = os.path.join(os.path.dirname(__file__), 'grammar_tables')
+# Where tables for unshipped grammars are saved and looked for, or None to
+# not save them at all. EbbLint.parse_options sets this from its options.
+cache_dir = os.path.join(default_cache_dir(), 'grammars')
+# marshal's format changed after version 2, so stick to that one.
+_marshal_version = 2
+
+
+def tables_name(grammar_source):
+    with open(grammar_source, 'rb') as infile:
+        digest = hashlib.sha256(infile.read()).hexdigest()
+    return 'py{}-{}.marshal'.format(sys.version_info[0], digest[:16])
+
+
+def dump_tables(g, path):
+    # Some pythons' pickled grammars have OrderedDicts, which marshal can't
+    # handle, but nothing depends on their order.
+    tables = {
+        name: dict(value) if isinstance(value, dict) else value
+        for name, value in vars(g).items()}
+    # Every dfa shares its list of states with `states`, so only store the
+    # states once.
+    dfas = tables.pop('dfas')
+    tables['firsts'] = {
+        number: dict(first) for number, (_, first) in dfas.items()}
+    data = marshal.dumps(tables, _marshal_version)
+    with open(path, 'wb') as outfile:
+        outfile.write(data)
+
+
+def load_tables(path):
+    with open(path, 'rb') as infile:
+        tables = marshal.loads(infile.read())
+    firsts = tables.pop('firsts')
+    states = tables['states']
+    tables['dfas'] = {
+        number: (states[number - 256], first)
+        for number, first in firsts.items()}
+    g = grammar.Grammar()
+    vars(g).update(tables)
+    return g
+
+
+def _load_packaged_grammar(original, package, grammar_source):
+    if not os.path.isfile(grammar_source):
+        # lib2to3 is in a zip file or some such, which lib2to3 knows how to
+        # deal with but tables_name doesn't.
+        return original(package, grammar_source)
+    name = tables_name(grammar_source)
+    directories = [tables_dir]
+    if cache_dir is not None:
+        directories.append(cache_dir)
+    for directory in directories:
+        try:
+            return load_tables(os.path.join(directory, name))
+        except (EnvironmentError, EOFError, ValueError, TypeError, KeyError):
+            continue
+
+    g = original(package, grammar_source)
+    if cache_dir is None:
+        return g
+    try:
+        try:
+            os.makedirs(cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        dump_tables(g, os.path.join(cache_dir, name))
+    except EnvironmentError:
+        pass
+    return g
+
+
+def load_pygram():
+    """
+    Import ``lib2to3.pygram``, having it load its grammars from prebuilt
+    tables if it hasn't been imported already.
+    """
+    pygram = sys.modules.get('lib2to3.pygram')
+    if pygram is not None:
+        return pygram
+    original = getattr(driver, 'load_packaged_grammar', None)
+    if original is not None:
+        driver.load_packaged_grammar = (
+            lambda package, grammar_source: _load_packaged_grammar(
+                original, package, grammar_source))
+    try:
+        from lib2to3 import pygram
+    finally:
+        if original is not None:
+            driver.load_packaged_grammar = original
+    return pygram
+
+
+def main():
+    """
+    Build the tables for the running python's grammars, to ship with
+    ebb-lint.
+    """
+    import lib2to3
+    lib2to3_dir = os.path.dirname(lib2to3.__file__)
+    for source in ['Grammar.txt', 'PatternGrammar.txt']:
+        grammar_source = os.path.join(lib2to3_dir, source)
+        g = driver.load_grammar(grammar_source)
+        dump_tables(g, os.path.join(tables_dir, tables_name(grammar_source)))
+
+
+if __name__ == '__main__':  # pragma: nocover
+    main()
@@ -0,0 +1,210 @@
+from __future__ import unicode_literals
+
+import bisect
+import io
+from lib2to3.pgen2 import parse, token, tokenize
+
+import six
+
+from ebb_lint.flake8 import EbbLint
+
+
+# Keywords which continue a compound statement at the top level rather than
+# starting a new one.
+_continuations = frozenset(['elif', 'else', 'except', 'finally'])
+
+
+def split_lines(source):
+    # Split the way the tokenizer does, which is only on '\n'.
+    return io.StringIO(six.text_type(source)).readlines()
+
+
+def chunk_starts(tokens):
+    """
+    Split a file into chunks of whole top-level statements.
+
+    Returns the line each chunk starts on, and the index in ``tokens`` of each
+    chunk's first token. Every chunk starts at the beginning of a line, and
+    takes in the comments and blank lines before its first statement. A
+    decorator stays in the same chunk as what it decorates.
+    """
+    starts = [1]
+    firsts = [None]
+    level = 0
+    last_newline = None
+    at_line_start = True
+    decorator = False
+    for idx, tok in enumerate(tokens):
+        if tok.type == token.INDENT:
+            level += 1
+        elif tok.type == token.DEDENT:
+            level -= 1
+        elif tok.type == token.NEWLINE:
+            last_newline = tok.lineno
+            at_line_start = True
+        elif tok.type == token.ENDMARKER:
+            break
+        else:
+            if at_line_start and level == 0:
+                if firsts[0] is None:
+                    firsts[0] = idx
+                elif not decorator and tok.value not in _continuations:
+                    starts.append(last_newline + 1)
+                    firsts.append(idx)
+                decorator = tok.value == '@'
+            at_line_start = False
+    return starts, firsts
+
+
+def header_chunks(tokens, firsts):
+    """
+    Count the chunks which can affect how the rest of the file is linted.
+
+    That's the first chunk, which has the comments at the top of the file,
+    any docstring and ``from __future__`` imports after it, and the chunk
+    after those, which an edit could turn into another future import.
+    """
+    seen_docstring = False
+    for e, idx in enumerate(firsts):
+        if idx is None:
+            break
+        tok = tokens[idx]
+        if tok.type == token.STRING and not seen_docstring:
+            seen_docstring = True
+        elif not (tok.value == 'from'
+                  and tokens[idx + 1].value == '__future__'):
+            break
+    else:
+        return len(firsts)
+    return e + 1
+
+
+class IncrementalLint(object):
+    """
+    Lint a file, then keep its errors up to date as it's edited.
+
+    The file is split into chunks of whole top-level statements. After an
+    edit, only the chunks the edit touched are tokenized, parsed and checked
+    again, as if they were a file of their own; the errors in every other
+    chunk are kept, and moved up or down if the edit changed how many lines
+    come before them.
+
+    The whole file is linted again if the edit touches the start of the file,
+    where comments and ``__future__`` imports change how everything else is
+    checked, or if the edited chunks can't be linted on their own: an edit
+    can leave a statement unfinished, or make it continue into the next
+    chunk.
+
+    ``EbbLint.parse_options`` must have been called first, like it would be
+    by flake8. Errors are ``(lineno, column, message)`` tuples.
+    """
+
+    def __init__(self, filename, source):
+        self.filename = filename
+        self._lines = split_lines(source)
+        self._relint()
+
+    @property
+    def source(self):
+        return ''.join(self._lines)
+
+    @property
+    def errors(self):
+        return sorted(
+            (start + offset, column, message)
+            for start, errors in zip(self._starts, self._errors)
+            for offset, column, message in errors)
+
+    def _lint(self, lines, chunk=False):
+        lint = EbbLint(None, self.filename, lines=lines)
+        if chunk:
+            lint.future_features = self._future_features
+            lint.context = self._context
+        errors = [
+            (lineno, column, message)
+            for lineno, column, message, _ in lint._run_uncached()]
+        return lint, errors
+
+    def _chunk(self, first_line, starts, errors):
+        errors_by_chunk = [[] for _ in starts]
+        for lineno, column, message in errors:
+            e = max(bisect.bisect_right(starts, lineno) - 1, 0)
+            errors_by_chunk[e].append((lineno - starts[e], column, message))
+        return [start + first_line - 1 for start in starts], errors_by_chunk
+
+    def _relint(self):
+        self._starts = self._errors = None
+        lint, errors = self._lint(self._lines)
+        starts, firsts = chunk_starts(lint.tokens)
+        self._header = header_chunks(lint.tokens, firsts)
+        self._future_features = lint.future_features
+        self._context = lint.root_context
+        self._starts, self._errors = self._chunk(1, starts, errors)
+
+    def _offset_in(self, lines, lineno, column):
+        if not 1 <= lineno <= len(lines) + 1:
+            raise ValueError('line {} is not in the file'.format(lineno))
+        return sum(len(line) for line in lines[:lineno - 1]) + column
+
+    def edit(self, start, end, text):
+        """
+        Replace the text between two ``(lineno, column)`` positions, and
+        return the file's errors afterwards.
+
+        Positions are numbered the same way error positions are: lines from
+        1, and columns from 0.
+        """
+        if self._starts is None:
+            # The last lint failed partway, so there's nothing to build on.
+            self._replace(0, len(self._lines), self._lines, start, end, text)
+            self._relint()
+            return self.errors
+
+        first = max(bisect.bisect_right(self._starts, start[0]) - 1, 0)
+        last = max(bisect.bisect_right(self._starts, end[0]) - 1, first)
+        first_line = self._starts[first]
+        if last + 1 < len(self._starts):
+            end_line = self._starts[last + 1]
+        else:
+            end_line = len(self._lines) + 1
+        old_lines = self._lines[first_line - 1:end_line - 1]
+        new_lines = self._replace(
+            first_line - 1, end_line - 1, old_lines,
+            (start[0] - first_line + 1, start[1]),
+            (end[0] - first_line + 1, end[1]), text)
+
+        if first < self._header:
+            self._relint()
+            return self.errors
+
+        try:
+            lint, errors = self._lint(new_lines, chunk=True)
+        except (parse.ParseError, tokenize.TokenError, IndentationError):
+            lint = None
+        # If the whole file was linted without a lib2to3 tree, there's no
+        # context from its root to check a chunk's tree in.
+        if lint is None or (lint.cst is not None and self._context is None):
+            self._relint()
+            return self.errors
+
+        if new_lines:
+            starts, _ = chunk_starts(lint.tokens)
+            starts, errors = self._chunk(first_line, starts, errors)
+        else:
+            starts = errors = []
+        delta = len(new_lines) - len(old_lines)
+        self._starts[first:last + 1] = starts
+        self._errors[first:last + 1] = errors
+        for e in range(first + len(starts), len(self._starts)):
+            self._starts[e] += delta
+        return self.errors
+
+    def _replace(self, lower, upper, old_lines, start, end, text):
+        old = ''.join(old_lines)
+        new = (
+            old[:self._offset_in(old_lines, *start)]
+            + text
+            + old[self._offset_in(old_lines, *end):])
+        new_lines = split_lines(new)
+        self._lines[lower:upper] = new_lines
+        return new_lines
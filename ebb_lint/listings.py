@@ -0,0 +1,73 @@
+from __future__ import unicode_literals
+
+import os
+
+
+# What's in each directory, by absolute path, along with the directory's
+# modification time when it was listed (None if it couldn't be). Every file
+# linted in this process shares them, so a directory is only listed again
+# once something has been added to or removed from it.
+_listings = {}
+# The directories whose modification times have been looked at since the
+# last recheck.
+_checked = set()
+
+
+def recheck():
+    """
+    Make sure every directory is still the same the next time it's looked
+    in. This is done before linting each file, so that a long-running process
+    notices files being added and removed, without looking at a directory
+    more than once per file.
+    """
+    _checked.clear()
+
+
+def directory_names(dirname):
+    """
+    Return the names of everything in a directory, or nothing if it can't be
+    listed.
+    """
+    if not os.path.isabs(dirname):
+        dirname = os.path.abspath(dirname)
+    listing = _listings.get(dirname)
+    if listing is not None and dirname in _checked:
+        return listing[1]
+    _checked.add(dirname)
+    try:
+        mtime = os.stat(dirname).st_mtime
+    except OSError:
+        mtime = None
+    if listing is not None and listing[0] == mtime:
+        return listing[1]
+    names = frozenset()
+    if mtime is not None:
+        try:
+            names = frozenset(os.listdir(dirname))
+        except OSError:
+            pass
+    _listings[dirname] = mtime, names
+    return names
+
+
+def checked_directories():
+    """
+    Return every directory looked in since the last recheck, along with its
+    modification time when it was (None if it couldn't be looked at).
+    """
+    return sorted((dirname, _listings[dirname][0]) for dirname in _checked)
+
+
+def unchanged(directories):
+    """
+    Return whether every directory still has the modification time
+    ``checked_directories`` returned for it.
+    """
+    for dirname, mtime in directories:
+        try:
+            current = os.stat(dirname).st_mtime
+        except OSError:
+            current = None
+        if current != mtime:
+            return False
+    return True
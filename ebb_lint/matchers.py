@@ -0,0 +1,618 @@
+from __future__ import unicode_literals
+
+import itertools
+from lib2to3 import pytree
+from lib2to3.pgen2 import token
+
+import six
+
+from ebb_lint.grammars import load_pygram
+from ebb_lint.traversal import Walker
+
+
+# lib2to3's patterns are matched by walking a tree of pattern objects, and any
+# pattern with a wildcard in it is matched by stacks of generators trying every
+# way the wildcards could be split up, even though most of them can only match
+# one way. Each checker's pattern is run against a great many nodes, so
+# instead, its pattern is turned into a python function which checks node
+# types and leaf values directly, and which only loops over the splits that
+# could match.
+#
+# The functions have to find exactly the same matches, in the same order, as
+# lib2to3 would, so that the same nodes are bound to the same names; anything
+# that isn't understood here is left to lib2to3's own matching.
+
+
+def _is_single(pattern):
+    """
+    Whether a pattern always matches exactly one node, in which case only its
+    first way of matching a node matters.
+    """
+    if isinstance(pattern, (pytree.LeafPattern, pytree.NodePattern)):
+        return True
+    if isinstance(pattern, pytree.WildcardPattern):
+        return (
+            pattern.content is not None
+            and pattern.min == pattern.max == 1
+            and pattern.name != 'bare_name'
+            and all(len(alternative) == 1 and _is_single(alternative[0])
+                    for alternative in pattern.content))
+    return False
+
+
+def _binds(pattern):
+    """
+    Whether matching a pattern could add anything to the results.
+    """
+    if isinstance(pattern, pytree.NegatedPattern):
+        return False
+    if pattern.name:
+        return True
+    if isinstance(pattern, pytree.LeafPattern) or pattern.content is None:
+        return False
+    if isinstance(pattern, pytree.WildcardPattern):
+        return any(_binds(p) for alternative in pattern.content
+                   for p in alternative)
+    return any(_binds(p) for p in pattern.content)
+
+
+def _flatten(patterns):
+    """
+    Splice in the patterns of every unnamed wildcard which only matches one
+    sequence once, which is how patcomp compiles a node's children; they
+    match exactly the same way as part of the outer sequence.
+    """
+    flat = []
+    for pattern in patterns:
+        if (isinstance(pattern, pytree.WildcardPattern)
+                and pattern.content is not None
+                and len(pattern.content) == 1
+                and pattern.min == pattern.max == 1
+                and not pattern.name):
+            flat.extend(_flatten(pattern.content[0]))
+        else:
+            flat.append(pattern)
+    return flat
+
+
+def _repeated(pattern):
+    """
+    For a wildcard which repeats one pattern matching a single node, without
+    adding anything to the results, return that pattern, or None if it
+    repeats any node at all; otherwise return False.
+    """
+    if not isinstance(pattern, pytree.WildcardPattern):
+        return False
+    if pattern.content is None:
+        return None
+    if pattern.name == 'bare_name' or len(pattern.content) != 1:
+        return False
+    [alternative] = pattern.content
+    if len(alternative) != 1:
+        return False
+    [repeated] = alternative
+    if not _is_single(repeated) or _binds(repeated):
+        return False
+    if (isinstance(repeated, pytree.NodePattern)
+            and repeated.type is None and repeated.content is None):
+        return None
+    return repeated
+
+
+class _Generator(object):
+    def __init__(self):
+        self.functions = []
+        # Patterns which are matched by lib2to3, in the order they were found.
+        self.patterns = []
+        self._counter = itertools.count()
+
+    def function(self, name, args):
+        lines = ['def {}({}):'.format(name, args)]
+        self.functions.append(lines)
+        return lines
+
+    def emit(self, lines, indent, line):
+        lines.append('    ' * indent + line)
+
+    def unhandled(self, pattern):
+        self.patterns.append(pattern)
+        return '_patterns[{}]'.format(len(self.patterns) - 1)
+
+    def conditions(self, pattern, expr):
+        conditions = []
+        if isinstance(pattern, pytree.LeafPattern):
+            conditions.append('isinstance({}, _Leaf)'.format(expr))
+        if pattern.type is not None:
+            conditions.append('{}.type == {!r}'.format(expr, pattern.type))
+        if isinstance(pattern, pytree.LeafPattern) \
+                and pattern.content is not None:
+            conditions.append(
+                '{}.value == {!r}'.format(expr, pattern.content))
+        return conditions
+
+    def check(self, pattern, expr, results):
+        """
+        Return a condition for one node matching a pattern, and the lines which
+        add its match to ``results`` afterward.
+        """
+        if (isinstance(pattern, (pytree.LeafPattern, pytree.NodePattern))
+                and (isinstance(pattern, pytree.LeafPattern)
+                     or pattern.content is None)):
+            condition = ' and '.join(
+                self.conditions(pattern, expr)) or 'True'
+            bindings = []
+            if pattern.name:
+                bindings.append('{}[{!r}] = {}'.format(
+                    results, pattern.name, expr))
+            return condition, bindings
+        if _is_single(pattern):
+            matcher = self.single(pattern)
+        else:
+            matcher = self.unhandled(pattern) + '.match'
+        if not _binds(pattern):
+            results = 'None'
+        return '{}({}, {})'.format(matcher, expr, results), []
+
+    def single(self, pattern):
+        """
+        Generate a function which does the same as ``pattern.match``, for a
+        pattern which matches exactly one node, and return its name.
+        """
+        name = '_match{}'.format(next(self._counter))
+        out = self.function(name, 'node, results')
+        if isinstance(pattern, pytree.WildcardPattern):
+            for [alternative] in pattern.content:
+                binds = _binds(alternative)
+                condition, bindings = self.check(alternative, 'node', 'r')
+                if binds:
+                    self.emit(out, 1, 'r = {}')
+                self.emit(out, 1, 'if {}:'.format(condition))
+                for line in bindings:
+                    self.emit(out, 2, line)
+                if binds:
+                    self.emit(out, 2, 'results.update(r)')
+                if pattern.name:
+                    self.emit(out, 2, 'results[{!r}] = [node]'.format(
+                        pattern.name))
+                self.emit(out, 2, 'return True')
+            self.emit(out, 1, 'return False')
+            return name
+
+        conditions = self.conditions(pattern, 'node')
+        if conditions:
+            self.emit(out, 1, 'if not ({}):'.format(
+                ' and '.join(conditions)))
+            self.emit(out, 2, 'return False')
+        if isinstance(pattern, pytree.NodePattern) \
+                and pattern.content is not None:
+            binds = _binds(pattern)
+            self.emit(out, 1, 'ch = node.children')
+            if binds:
+                self.emit(out, 1, 'r = {}')
+            if pattern.wildcards:
+                sequence = self.sequence(pattern.content)
+                self.emit(out, 1, 'if not {}(ch, {}):'.format(
+                    sequence, 'r' if binds else 'None'))
+                self.emit(out, 2, 'return False')
+            else:
+                self.emit(out, 1, 'if len(ch) != {}:'.format(
+                    len(pattern.content)))
+                self.emit(out, 2, 'return False')
+                for e, child in enumerate(pattern.content):
+                    condition, bindings = self.check(
+                        child, 'ch[{}]'.format(e), 'r')
+                    self.emit(out, 1, 'if not ({}):'.format(condition))
+                    self.emit(out, 2, 'return False')
+                    for line in bindings:
+                        self.emit(out, 1, line)
+            if binds:
+                self.emit(out, 1, 'results.update(r)')
+        if pattern.name:
+            self.emit(out, 1, 'results[{!r}] = node'.format(pattern.name))
+        self.emit(out, 1, 'return True')
+        return name
+
+    def sequence(self, patterns):
+        """
+        Generate a function which matches a list of nodes against a list of
+        patterns, some of them wildcards, and return its name.
+        """
+        name = '_sequence{}'.format(next(self._counter))
+        out = self.function(name, 'ch, results')
+        patterns = _flatten(patterns)
+        kinds = []
+        widths = []
+        for pattern in patterns:
+            if _is_single(pattern):
+                kinds.append('single')
+                widths.append(1)
+            elif _repeated(pattern) is not False:
+                kinds.append('repeat')
+                widths.append(pattern.min)
+            else:
+                kinds.append('unhandled')
+                widths.append(0)
+        # Each set of results, in the order lib2to3 would merge them.
+        merged = []
+        self.emit(out, 1, 'n = len(ch)')
+        self.emit(out, 1, 'i0 = 0')
+        indent = 1
+        for e, (pattern, kind) in enumerate(zip(patterns, kinds)):
+            here, after = 'i{}'.format(e), 'i{}'.format(e + 1)
+            results = 'r{}'.format(e)
+            rest_width = sum(widths[e + 1:])
+            if kind == 'single':
+                condition, bindings = self.check(
+                    pattern, 'ch[{}]'.format(here), results)
+                self.emit(out, indent, 'if {} + {} <= n:'.format(
+                    here, rest_width + 1))
+                indent += 1
+                if _binds(pattern):
+                    self.emit(out, indent, '{} = {{}}'.format(results))
+                    merged.append(results)
+                self.emit(out, indent, 'if {}:'.format(condition))
+                indent += 1
+                for line in bindings:
+                    self.emit(out, indent, line)
+                self.emit(out, indent, '{} = {} + 1'.format(after, here))
+            elif kind == 'repeat':
+                indent = self.repeat(
+                    out, indent, pattern, e, rest_width,
+                    all(k == 'single' for k in kinds[e + 1:]))
+                if pattern.name:
+                    self.emit(out, indent, '{} = {{{!r}: ch[{}:{}]}}'.format(
+                        results, pattern.name, here, after))
+                    merged.append(results)
+            else:
+                self.emit(
+                    out, indent,
+                    'for c{}, {} in {}.generate_matches(ch[{}:]):'.format(
+                        e, results, self.unhandled(pattern), here))
+                indent += 1
+                self.emit(out, indent, '{} = {} + c{}'.format(after, here, e))
+                if _binds(pattern):
+                    merged.append(results)
+        self.emit(out, indent, 'if i{} == n:'.format(len(patterns)))
+        indent += 1
+        for results in merged:
+            self.emit(out, indent, 'results.update({})'.format(results))
+        self.emit(out, indent, 'return True')
+        self.emit(out, 1, 'return False')
+        return name
+
+    def repeat(self, out, indent, pattern, e, rest_width, fixed):
+        """
+        Generate the lines which try each number of nodes a repeated pattern
+        could match, from fewest to most, like lib2to3 does; return the
+        indentation of the lines to run for each.
+        """
+        here, after = 'i{}'.format(e), 'i{}'.format(e + 1)
+        repeated = _repeated(pattern)
+        condition = None
+        if repeated is not None:
+            condition, _ = self.check(repeated, 'ch[k{}]'.format(e), None)
+        upper = 'n - {}'.format(rest_width)
+        if pattern.max < pytree.HUGE:
+            upper = 'min({}, {} + {})'.format(upper, here, pattern.max)
+
+        def scan(indent, limit):
+            # Find how many of the nodes in a row match.
+            self.emit(out, indent, 'k{} = {}'.format(e, here))
+            self.emit(out, indent, 'while k{} < {} and {}:'.format(
+                e, limit, condition))
+            self.emit(out, indent + 1, 'k{0} = k{0} + 1'.format(e))
+
+        if fixed:
+            # Everything after is one node each, so there's only one number of
+            # nodes this could match.
+            self.emit(out, indent, '{} = n - {}'.format(after, rest_width))
+            bounds = '{} + {} <= {}'.format(here, pattern.min, after)
+            if pattern.max < pytree.HUGE:
+                bounds += ' <= {} + {}'.format(here, pattern.max)
+            self.emit(out, indent, 'if {}:'.format(bounds))
+            indent += 1
+            if condition is not None:
+                scan(indent, after)
+                self.emit(out, indent, 'if k{} == {}:'.format(e, after))
+                indent += 1
+            return indent
+
+        if condition is not None:
+            self.emit(out, indent, 'u{} = {}'.format(e, upper))
+            scan(indent, 'u{}'.format(e))
+            upper = 'k{}'.format(e)
+        self.emit(out, indent, 'for {} in range({} + {}, {} + 1):'.format(
+            after, here, pattern.min, upper))
+        return indent + 1
+
+
+def generate_matcher(pattern):
+    """
+    Generate the source of a module with a ``match`` function that does the
+    same as ``pattern.match``, and return it along with the patterns the module
+    expects to find in ``_patterns``.
+    """
+    generator = _Generator()
+    if _is_single(pattern):
+        root = generator.single(pattern)
+    else:
+        root = generator.unhandled(pattern) + '.match'
+    lines = []
+    for function in reversed(generator.functions):
+        lines.extend(function)
+        lines.append('')
+    lines.append('match = {}'.format(root))
+    return '\n'.join(lines) + '\n', generator.patterns
+
+
+def compile_matcher(pattern):
+    """
+    Compile the module generated for a pattern, and return its code along
+    with the patterns it expects to find in ``_patterns``.
+    """
+    source, patterns = generate_matcher(pattern)
+    # Don't let this module's __future__ imports change what the generated
+    # string literals mean.
+    return compile(source, '<ebb-lint matcher>', 'exec', 0, True), patterns
+
+
+def load_matcher(code, patterns):
+    """
+    Run a compiled matcher module, and return its ``match`` function. It does
+    the same as ``pattern.match``, except that ``results`` must be a dict.
+    """
+    namespace = {'_Leaf': pytree.Leaf, '_patterns': patterns}
+    six.exec_(code, namespace)
+    return namespace['match']
+
+
+def pattern_root_types(pattern):
+    """
+    Work out which types of node a compiled pattern could match, or None if
+    it could match any type.
+    """
+    if isinstance(pattern, pytree.WildcardPattern):
+        if pattern.content is None or pattern.max < 1:
+            return None
+        types = set()
+        for alternative in pattern.content:
+            # A sequence of more than one pattern can only match a single node
+            # if some of them can match nothing, which isn't worth working
+            # out.
+            if len(alternative) != 1:
+                return None
+            alternative_types = pattern_root_types(alternative[0])
+            if alternative_types is None:
+                return None
+            types |= alternative_types
+        return frozenset(types)
+    elif isinstance(pattern, (pytree.NodePattern, pytree.LeafPattern)):
+        if pattern.type is None:
+            return None
+        return frozenset([pattern.type])
+    return None
+
+
+def index_checkers(checkers):
+    """
+    Index checkers by the types of node their patterns could match.
+
+    Returns a dict of node type to checkers, and the checkers for any type
+    not in the dict. Each list keeps the checkers in their original order.
+    """
+    root_types = [
+        pattern_root_types(matcher.pattern) for matcher, _, _ in checkers]
+    all_types = set()
+    for types in root_types:
+        if types is not None:
+            all_types |= types
+    by_type = {
+        typ: [checker for checker, types in zip(checkers, root_types)
+              if types is None or typ in types]
+        for typ in all_types}
+    any_type = [
+        checker for checker, types in zip(checkers, root_types)
+        if types is None]
+    return by_type, any_type
+
+
+_grammar_parents = {}
+
+
+def grammar_parents(grammar):
+    """
+    Map each symbol and token type in ``grammar`` to the symbols whose rules
+    can have it as a child.
+    """
+    parents = _grammar_parents.get(grammar)
+    if parents is None:
+        parents = _grammar_parents[grammar] = {}
+        for symbol, (states, _) in grammar.dfas.items():
+            for arcs in states:
+                for label, _ in arcs:
+                    typ, _ = grammar.labels[label]
+                    parents.setdefault(typ, set()).add(symbol)
+    return parents
+
+
+def subtree_types(index, grammar):
+    """
+    Work out which types of node could have a node one of the checkers in
+    ``index`` could match somewhere in their subtree, themselves included, or
+    None if any type could.
+
+    A node's descendants can only be of types its grammar rule can produce,
+    which is everything the types of the nodes that can be matched can be
+    reached from.
+    """
+    by_type, any_type = index
+    if any_type:
+        return None
+    parents = grammar_parents(grammar)
+    types = set(by_type)
+    stack = list(types)
+    while stack:
+        for parent in parents.get(stack.pop(), ()):
+            if parent not in types:
+                types.add(parent)
+                stack.append(parent)
+    return frozenset(types)
+
+
+class Matcher(object):
+    """
+    A compiled lib2to3 pattern, with a faster ``match`` method.
+
+    The matcher's code can be passed in, along with the patterns it needs,
+    if it's been compiled already.
+    """
+
+    def __init__(self, pattern, source=None, code=None, patterns=None):
+        self.pattern = pattern
+        self.source = source
+        if code is None:
+            code, patterns = compile_matcher(pattern)
+        self.code = code
+        self.patterns = patterns
+        self.match = load_matcher(code, patterns)
+
+
+_matchers = {}
+
+
+def compile_pattern(pattern_source):
+    """
+    Compile a pattern into a ``Matcher``, reusing any earlier ``Matcher`` for
+    the same pattern.
+    """
+    matcher = _matchers.get(pattern_source)
+    if matcher is None:
+        load_pygram()
+        from lib2to3 import patcomp
+        matcher = _matchers[pattern_source] = Matcher(
+            patcomp.compile_pattern(pattern_source), pattern_source)
+    return matcher
+
+
+def _steps(path):
+    for step in path:
+        if isinstance(step, tuple):
+            for alternative in step:
+                for substep in _steps(alternative):
+                    yield substep
+        else:
+            yield step
+
+
+def linear_subpattern(pattern_source):
+    """
+    Reduce a pattern to the path from a leaf up to the root of the pattern
+    which lib2to3's bottom matcher would look for, or None if it can't be.
+    """
+    load_pygram()
+    from lib2to3 import btm_utils, patcomp
+    _, tree = patcomp.PatternCompiler().compile_pattern(
+        pattern_source, with_tree=True)
+    try:
+        reduced = btm_utils.reduce_tree(tree)
+    except AttributeError:
+        # reduce_tree doesn't know about some of patcomp's names, like TOKEN.
+        return None
+    if reduced is None:
+        return None
+    path = reduced.get_linear_subpattern()
+    # Negative steps are placeholders, like for `any`, which never match
+    # anything in the automaton.
+    if not path or any(
+            not isinstance(step, (six.text_type, str, int)) or step in {
+                btm_utils.TYPE_ANY, btm_utils.TYPE_ALTERNATIVES,
+                btm_utils.TYPE_GROUP}
+            for step in _steps(path)):
+        return None
+    return path
+
+
+class BottomMatcher(object):
+    """
+    Find which checkers' patterns could match which nodes, in one pass up the
+    tree, with lib2to3's bottom matcher automaton.
+
+    Every pattern that can be is reduced to a path up the tree that all of its
+    matches have, from a leaf to the node the pattern would match, and all of
+    the paths are built into one automaton. Checkers whose patterns can't be
+    reduced are found by the types of node their patterns could match, like
+    ``index_checkers`` does.
+
+    lib2to3's own walk through the automaton takes shortcuts which can miss
+    matches, which 2to3 can live with but lint can't, so instead every node
+    keeps the set of states that any path up to it could be in.
+    """
+
+    def __init__(self, checkers):
+        from lib2to3 import btm_matcher
+        self.checkers = checkers
+        automaton = btm_matcher.BottomMatcher()
+        self._root = automaton.root
+        unreduced = []
+        for position, (matcher, _, _) in enumerate(checkers):
+            path = None
+            if matcher.source is not None:
+                path = linear_subpattern(matcher.source)
+            if path is None:
+                unreduced.append(checkers[position])
+                continue
+            for state in automaton.add(path, start=self._root):
+                state.fixers.append(position)
+        self.unreduced = unreduced
+        positions = {id(checker): e for e, checker in enumerate(checkers)}
+        by_type, any_type = index_checkers(unreduced)
+        self._by_type = {
+            typ: [positions[id(checker)] for checker in type_checkers]
+            for typ, type_checkers in by_type.items()}
+        self._any_type = [positions[id(checker)] for checker in any_type]
+
+    def run(self, tree):
+        """
+        Return each node in ``tree`` which any checker's pattern could match,
+        in pre-order, along with those checkers in their original order.
+        """
+        found = []
+        # The states reached from the children of each node being walked, for
+        # the node's own transition once they've all been walked.
+        incoming = [set()]
+        walker = Walker([tree])
+        order = 0
+        for node, exiting in walker:
+            if exiting is None:
+                walker.on_exit(node, order)
+                order += 1
+                incoming.append({self._root})
+                continue
+            states = self._step(node, incoming.pop())
+            incoming[-1].update(states)
+            node_positions = self._by_type.get(node.type, self._any_type)
+            fixers = [
+                position for state in states for position in state.fixers]
+            if fixers:
+                node_positions = sorted(set(node_positions).union(fixers))
+            if node_positions:
+                found.append((exiting, node, node_positions))
+        found.sort(key=lambda f: f[0])
+        return [
+            (node, [self.checkers[position] for position in positions])
+            for _, node, positions in found]
+
+    def _step(self, node, incoming):
+        # The automaton has leaf values for names, as that's what patterns
+        # usually look for, but a pattern can also ask for any NAME.
+        if node.type == token.NAME:
+            steps = node.value, token.NAME
+        else:
+            steps = node.type,
+        states = set()
+        for state in incoming:
+            table = state.transition_table
+            for step in steps:
+                if step in table:
+                    states.add(table[step])
+        return states
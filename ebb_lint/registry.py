@@ -0,0 +1,302 @@
+from __future__ import unicode_literals
+
+import ast
+import errno
+import hashlib
+import importlib
+import marshal
+import os
+import pkgutil
+import platform
+import stat
+import sys
+import tempfile
+
+import venusian
+from six.moves import cPickle as pickle
+
+from ebb_lint._version import __version__
+from ebb_lint import checkers
+from ebb_lint.errors import error_code
+from ebb_lint.matchers import Matcher, compile_pattern
+
+
+# Finding the checkers means importing and scanning every module in
+# ebb_lint.checkers, and compiling every pattern means parsing it with
+# lib2to3's pattern grammar and generating its matcher, which adds up to a
+# noticeable part of a short run. Instead, what was collected is saved to the
+# cache directory: the compiled patterns and the matchers' code, and the
+# checkers by their module and name. The file is named after a digest of
+# everything it was built from, so any change to the checkers or to python
+# makes for a different file, which is built the first time it's needed.
+#
+# Loading the file runs the code in it, so it's only ever kept in the user's
+# own cache directory, never one a project's configuration can point at, and
+# it's only loaded if nobody else could have written it.
+#
+# The cache also keeps the codes of the errors each module's checkers were
+# registered as reporting, so that a module none of whose errors are enabled
+# isn't even imported. A module with a checker that doesn't say what it
+# reports is always loaded.
+
+# The pickle protocol both python 2 and 3 can read.
+_pickle_protocol = 2
+
+
+def version_enabled(extra):
+    if ('python_minimum_version' in extra
+            and sys.version_info < extra['python_minimum_version']):
+        return False
+    if ('python_disabled_version' in extra
+            and sys.version_info > extra['python_disabled_version']):
+        return False
+    return True
+
+
+def scan_module(module):
+    """
+    Find every checker in a module which is enabled for the running python,
+    and compile their patterns.
+
+    Returns the lib2to3 checkers as ``(matcher, checker, extra)`` and the
+    ``ast`` checkers as ``(node_types, replaces, checker, extra)``.
+    """
+    collected_checkers = []
+    collected_ast_checkers = []
+
+    def register_checker(pattern, checker, extra):
+        if not version_enabled(extra):
+            return
+        collected_checkers.append((compile_pattern(pattern), checker, extra))
+
+    def register_ast_checker(node_types, replaces, checker, extra):
+        if not version_enabled(extra):
+            return
+        node_types = tuple(
+            getattr(ast, name) for name in node_types if hasattr(ast, name))
+        collected_ast_checkers.append((node_types, replaces, checker, extra))
+
+    scanner = venusian.Scanner(
+        register=register_checker, register_ast=register_ast_checker)
+    scanner.scan(module)
+    return collected_checkers, collected_ast_checkers
+
+
+def checker_modules():
+    """
+    Return the names of the modules in ``ebb_lint.checkers``, without
+    importing them.
+    """
+    return sorted(
+        '{}.{}'.format(checkers.__name__, name)
+        for _, name, _ in pkgutil.iter_modules(checkers.__path__))
+
+
+def module_codes(module):
+    """
+    Return the codes of the errors a module's checkers were registered as
+    reporting, or None if any of them doesn't say. Unlike ``scan_module``,
+    this doesn't compile any patterns.
+    """
+    extras = []
+
+    def register_checker(pattern, checker, extra):
+        extras.append(extra)
+
+    def register_ast_checker(node_types, replaces, checker, extra):
+        pass
+
+    scanner = venusian.Scanner(
+        register=register_checker, register_ast=register_ast_checker)
+    scanner.scan(module)
+    if any('errors' not in extra for extra in extras):
+        return None
+    return sorted({
+        error_code(error) for extra in extras for error in extra['errors']})
+
+
+def _sources():
+    checkers_dir = os.path.dirname(checkers.__file__)
+    package_dir = os.path.dirname(checkers_dir)
+    paths = [
+        os.path.join(checkers_dir, name)
+        for name in sorted(os.listdir(checkers_dir)) if name.endswith('.py')]
+    paths.extend(
+        os.path.join(package_dir, name)
+        for name in ['errors.py', 'matchers.py', 'registry.py'])
+    return paths
+
+
+def registry_key():
+    """
+    Digest everything that goes into the collected checkers: the python
+    running them, ebb-lint's version, and the source of the checkers and of
+    the code compiling their patterns.
+    """
+    digest = hashlib.sha256()
+    for part in [
+            platform.python_implementation(), sys.version, __version__]:
+        digest.update(part.encode('utf-8') + b'\0')
+    for path in _sources():
+        with open(path, 'rb') as infile:
+            contents = infile.read()
+        digest.update(os.path.basename(path).encode('utf-8') + b'\0')
+        digest.update(hashlib.sha256(contents).digest())
+    return digest.hexdigest()[:32]
+
+
+def _reference(func):
+    module, name = func.__module__, func.__name__
+    if getattr(sys.modules.get(module), name, None) is not func:
+        raise ValueError('{!r} is not importable as {}.{}'.format(
+            func, module, name))
+    return module, name
+
+
+def _resolve(reference):
+    module, name = reference
+    return getattr(importlib.import_module(module), name)
+
+
+def dump_module(collected_checkers, collected_ast_checkers):
+    """
+    Serialize what was collected from one module.
+    """
+    entry = {
+        'checkers': [
+            (_reference(checker), matcher.source, matcher.pattern,
+             marshal.dumps(matcher.code), matcher.patterns, extra)
+            for matcher, checker, extra in collected_checkers],
+        'ast_checkers': [
+            ([node_type.__name__ for node_type in node_types],
+             _reference(replaces), _reference(checker), extra)
+            for node_types, replaces, checker, extra
+            in collected_ast_checkers],
+    }
+    return pickle.dumps(entry, _pickle_protocol)
+
+
+def load_module(data):
+    """
+    Rebuild what was collected from one module, importing it.
+    """
+    entry = pickle.loads(data)
+    collected_checkers = [
+        (Matcher(pattern, source, marshal.loads(code), patterns),
+         _resolve(reference), extra)
+        for reference, source, pattern, code, patterns, extra
+        in entry['checkers']]
+    collected_ast_checkers = [
+        (tuple(getattr(ast, name) for name in node_types),
+         _resolve(replaces), _resolve(reference), extra)
+        for node_types, replaces, reference, extra in entry['ast_checkers']]
+    return collected_checkers, collected_ast_checkers
+
+
+def dump_registry(path, registry):
+    data = pickle.dumps(registry, _pickle_protocol)
+    # Write the whole file somewhere else first, so that another process
+    # never reads half of it.
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.write(data)
+        os.rename(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def only_writable_by_owner(path):
+    """
+    Return whether a file and the directory it's in both belong to the user
+    running this, and nobody else can write to either of them.
+    """
+    getuid = getattr(os, 'getuid', None)
+    if getuid is None:  # pragma: nocover
+        return True
+    for p in [path, os.path.dirname(path)]:
+        st = os.stat(p)
+        if st.st_uid != getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return False
+    return True
+
+
+def load_registry(path):
+    if not only_writable_by_owner(path):
+        raise ValueError('{} could have been written by someone else'.format(
+            path))
+    with open(path, 'rb') as infile:
+        registry = pickle.load(infile)
+    if set(registry) != {'codes', 'modules'}:
+        raise ValueError('not a registry')
+    return registry
+
+
+_load_errors = (
+    EnvironmentError, EOFError, ValueError, TypeError, KeyError,
+    AttributeError, ImportError, pickle.UnpicklingError)
+
+
+def collect_checkers(cache_dir, codes=None):
+    """
+    Return the lib2to3 checkers and the ``ast`` checkers from every module
+    which can report one of ``codes``, or from every module if ``codes`` is
+    None, the same way ``scan_module`` would.
+
+    Unless ``cache_dir`` is None, whatever can be is loaded from the cache
+    directory, and whatever can't is saved there for next time.
+    """
+    registry = {'codes': {}, 'modules': {}}
+    if cache_dir is not None:
+        registry_dir = os.path.join(cache_dir, 'checkers')
+        path = os.path.join(registry_dir, registry_key() + '.pickle')
+        try:
+            registry = load_registry(path)
+        except _load_errors:
+            pass
+    changed = False
+
+    collected_checkers = []
+    collected_ast_checkers = []
+    for name in checker_modules():
+        if name in registry['codes']:
+            module = None
+            declared = registry['codes'][name]
+        else:
+            module = importlib.import_module(name)
+            declared = registry['codes'][name] = module_codes(module)
+            changed = True
+        if (codes is not None and declared is not None
+                and codes.isdisjoint(declared)):
+            continue
+
+        collected = None
+        if name in registry['modules']:
+            try:
+                collected = load_module(registry['modules'][name])
+            except _load_errors:
+                pass
+        if collected is None:
+            if module is None:
+                module = importlib.import_module(name)
+            collected = scan_module(module)
+            try:
+                registry['modules'][name] = dump_module(*collected)
+                changed = True
+            except (ValueError, pickle.PicklingError):
+                pass
+        collected_checkers.extend(collected[0])
+        collected_ast_checkers.extend(collected[1])
+
+    if changed and cache_dir is not None:
+        try:
+            try:
+                os.makedirs(registry_dir, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            dump_registry(path, registry)
+        except (EnvironmentError, ValueError, pickle.PicklingError):
+            pass
+    return collected_checkers, collected_ast_checkers
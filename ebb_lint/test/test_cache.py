@@ -0,0 +1,53 @@
+from __future__ import unicode_literals
+
+from ebb_lint.cache import LRUStore
+
+
+def test_round_trip(tmpdir):
+    store = LRUStore(tmpdir.join('cache', 'store.sqlite3').strpath, 10)
+    assert store.get('spam') is None
+    store.put('spam', b'eggs')
+    assert store.get('spam') == b'eggs'
+    store.put('spam', b'more eggs')
+    assert store.get('spam') == b'more eggs'
+    assert len(store) == 1
+
+
+def test_shared_between_stores(tmpdir):
+    path = tmpdir.join('store.sqlite3').strpath
+    LRUStore(path, 10).put('spam', b'eggs')
+    assert LRUStore(path, 10).get('spam') == b'eggs'
+
+
+def test_least_recently_used_evicted(tmpdir):
+    store = LRUStore(tmpdir.join('store.sqlite3').strpath, 10)
+    keys = [str(e) for e in range(10)]
+    for key in keys:
+        store.put(key, key.encode('ascii'))
+    assert store.get('0') == b'0'
+    store.put('a', b'a')
+    assert len(store) == 9
+    assert [store.get(key) for key in ['1', '2']] == [None, None]
+    assert [store.get(key) for key in ['0', 'a'] + keys[3:]] == [
+        key.encode('ascii') for key in ['0', 'a'] + keys[3:]]
+
+
+def test_evicted_in_batches(monkeypatch, tmpdir):
+    store = LRUStore(tmpdir.join('store.sqlite3').strpath, 100)
+    evictions = []
+    evict = store._evict
+    monkeypatch.setattr(
+        store, '_evict',
+        lambda connection: evictions.append(len(store)) or evict(connection))
+    for e in range(130):
+        store.put(str(e), b'')
+    assert evictions == [101, 101, 101]
+    assert len(store) == 97
+
+
+def test_unusable_path_is_a_miss(tmpdir):
+    blocker = tmpdir.join('file')
+    blocker.write('')
+    store = LRUStore(blocker.join('store.sqlite3').strpath, 10)
+    store.put('spam', b'eggs')
+    assert store.get('spam') is None
@@ -0,0 +1,129 @@
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from ebb_lint import cli
+
+
+@pytest.fixture(autouse=True)
+def fresh_workers(monkeypatch, tmpdir):
+    monkeypatch.setenv('XDG_CACHE_HOME', tmpdir.join('cache').strpath)
+    # Other tests set EbbLint up with their own options.
+    monkeypatch.setattr(cli, '_worker_values', None)
+
+
+@pytest.fixture
+def tree(tmpdir):
+    for path in [
+            'b.py', 'notes.txt', 'sub/c.py', '.git/d.py', '__pycache__/e.py']:
+        tmpdir.join(path).write('z = map(lambda y: y, 1)\n', ensure=True)
+    tmpdir.join('a.py').write(
+        'x = 1\nz = map(lambda y: y, 2)\ny = [1' + ', 1' * 30 + ']\n')
+    return tmpdir
+
+
+def lint(capsys, *args):
+    status = cli.main(['--no-ebb-lint-cache'] + list(args))
+    out, err = capsys.readouterr()
+    assert not err
+    return status, [
+        ' '.join(line.split(' ', 2)[:2]) for line in out.splitlines()]
+
+
+def test_finding_files(tree):
+    paths = [tree.strpath, tree.join('notes.txt').strpath]
+    assert [os.path.relpath(path, tree.strpath)
+            for path in cli.find_files(paths)] == [
+        'a.py', 'b.py', os.path.join('sub', 'c.py'), 'notes.txt']
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_errors_are_sorted(capsys, tree, jobs):
+    status, locations = lint(capsys, '-j', jobs, tree.strpath)
+    assert status == 1
+    assert [os.path.relpath(location, tree.strpath)
+            for location in locations] == [
+        'a.py:2:5: L211', 'a.py:3:80: L302', 'b.py:1:5: L211',
+        os.path.join('sub', 'c.py:1:5: L211')]
+
+
+def test_clean_files(capsys, tree):
+    assert lint(capsys, tree.join('sub', 'c.py').strpath, '--ignore',
+                'L1,L211') == (0, [])
+
+
+@pytest.mark.parametrize('args, codes', [
+    (['--select', 'L3'], ['L302']),
+    (['--select', 'L211,L3', '--ignore', 'L302'], ['L211']),
+    (['--max-line-length', '100'], ['L211']),
+])
+def test_options(capsys, tree, args, codes):
+    _, locations = lint(capsys, tree.join('a.py').strpath, *args)
+    assert [location.rsplit(' ', 1)[-1] for location in locations] == codes
+
+
+def test_hard_max_line_length(capsys, tree):
+    assert cli.main([
+        '--no-ebb-lint-cache', '--hard-max-line-length', '90', '--select',
+        'L302', tree.join('a.py').strpath]) == 1
+    out, _ = capsys.readouterr()
+    assert '(97 > hard limit of 90 characters)' in out
+
+
+def test_no_paths(capsys):
+    with pytest.raises(SystemExit):
+        cli.main([])
+    capsys.readouterr()
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_files_which_cannot_be_linted(capsys, tree, jobs):
+    tree.join('b.py').write('def\n')
+    status, locations = lint(capsys, '-j', jobs, tree.strpath)
+    assert status == 1
+    assert [os.path.relpath(location, tree.strpath)
+            for location in locations] == [
+        'a.py:2:5: L211', 'a.py:3:80: L302', 'b.py:1:1: E902',
+        os.path.join('sub', 'c.py:1:5: L211')]
+
+
+def option_values(*args):
+    options, _ = cli.make_parser().parse_args(
+        ['--no-ebb-lint-cache'] + list(args))
+    values = dict(vars(options))
+    del values['jobs']
+    return values
+
+
+def test_warmed_up_processes_are_not_set_up_again(monkeypatch, tree):
+    values = option_values()
+    cli.warm_up(values)
+
+    def parse_options(options):
+        raise AssertionError('set up again')
+
+    monkeypatch.setattr(cli.EbbLint, 'parse_options', parse_options)
+    assert cli.lint_file(values, tree.join('b.py').strpath) == [
+        (tree.join('b.py').strpath, 1, 4, (
+            'L211 use a comprehension instead of map with lambda'))]
+
+
+def test_workers_with_and_without_a_warm_parent(tree):
+    values = option_values('--select', 'L2')
+    filenames = list(cli.find_files([tree.strpath]))
+    assert cli.lint_files(values, filenames, 2) == cli.lint_files(
+        values, filenames, 2, warm_parent=False)
+
+
+@pytest.mark.parametrize('warm_parent', [True, False])
+def test_the_warm_parent_is_unfrozen(monkeypatch, tree, warm_parent):
+    calls = []
+    for name in ['freeze', 'unfreeze']:
+        monkeypatch.setattr(
+            cli.gc, name, lambda name=name: calls.append(name), raising=False)
+    values = option_values('--select', 'L2')
+    filenames = list(cli.find_files([tree.strpath]))
+    assert cli.lint_files(values, filenames, 2, warm_parent=warm_parent)
+    assert calls == (['freeze', 'unfreeze'] if warm_parent else [])
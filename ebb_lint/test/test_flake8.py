@@ -3,15 +3,30 @@ from __future__ import unicode_literals
 
 import ast
 import functools
+import io
+import os
 import re
 import sys
+from lib2to3 import patcomp
+from lib2to3.pgen2 import token, tokenize
+from lib2to3.pgen2.tokenize import TokenError
+from lib2to3.pygram import python_symbols
 
 import pycodestyle
 import pytest
 import six
 from flake8.engine import get_parser
 
-from ebb_lint.flake8 import EbbLint, Lines
+from ebb_lint import grammars
+from ebb_lint.errors import Errors
+from ebb_lint.flake8 import (
+    EbbLint, Lines, bytes_on_line, detect_future_features,
+    driver_for_grammar, grammar_for_future_features, parse_source,
+    read_file_using_source_encoding)
+from ebb_lint.incremental import IncrementalLint, split_lines
+from ebb_lint.matchers import (
+    BottomMatcher, compile_pattern, index_checkers, pattern_root_types)
+from ebb_lint.tokens import Token, TokenTable
 
 
 py2skip = pytest.mark.skipif(not six.PY3, reason='not runnable on python 2')
@@ -41,19 +56,22 @@ def find_error_locations(source):
         return ''
 
     source = _code_pattern.sub(replacement, source)
-    lines = Lines(source.splitlines(True))
+    lines = Lines(source)
     return source, [
         lines.position_of_byte(b) + (code,) for b, code, _ in error_locations]
 
 
 @pytest.fixture(autouse=True)
-def scan_for_checkers(request):
+def scan_for_checkers(request, monkeypatch, tmpdir):
+    monkeypatch.setenv('XDG_CACHE_HOME', tmpdir.join('cache').strpath)
     parser, options_hooks = get_parser()
     args_marker = request.node.get_marker('flake8_args')
     if args_marker is None:
         args = []
     else:
         args = list(args_marker.args)
+    if 'backend' in request.fixturenames:
+        args.extend(['--ebb-lint-backend', request.getfixturevalue('backend')])
     opts, args = parser.parse_args(args)
     opts.ignore = tuple(opts.ignore)
     EbbLint.parse_options(opts)
@@ -1153,10 +1171,18 @@ all_filename_sources = [
     ('__init__.py', source) for source in dunder_init_sources]
 
 
+@pytest.fixture(params=['cst', 'hybrid'])
+def backend(request):
+    return request.param
+
+
 def assert_ebb_lint(source_text, source_path, error_locations):
     lint = EbbLint(ast.parse(source_text), source_path)
-    return [
+    actual = [
         (line, col, message[:4]) for line, col, message, _ in lint.run()]
+    # flake8 sorts what's reported, so the order errors are found in doesn't
+    # matter.
+    assert sorted(actual) == sorted(error_locations)
 
 
 @pytest.fixture
@@ -1172,20 +1198,22 @@ def assert_lint():
 
 
 @pytest.mark.parametrize(('filename', 'source'), all_filename_sources)
-def test_linting_with_filename(assert_lint, tmpdir, source, filename):
+def test_linting_with_filename(
+        assert_lint, tmpdir, backend, source, filename):
     sourcefile = tmpdir.join(filename)
     assert_lint(source, sourcefile)
 
 
 @pytest.mark.parametrize('source', all_sources)
-def test_linting_with_default_filename(assert_lint, tmpdir, source):
+def test_linting_with_default_filename(
+        assert_lint, tmpdir, backend, source):
     sourcefile = tmpdir.join('source.py')
     assert_lint(source, sourcefile)
 
 
 if six.PY2:
     @pytest.mark.parametrize('source', all_sources)
-    def test_linting_with_stdin_bytes(monkeypatch, source):
+    def test_linting_with_stdin_bytes(monkeypatch, backend, source):
         clean_source, error_locations = find_error_locations(source)
         clean_source_bytes = clean_source.encode('utf-8')
         monkeypatch.setattr(
@@ -1194,7 +1222,7 @@ if six.PY2:
 
 else:
     @pytest.mark.parametrize('source', all_sources)
-    def test_linting_with_stdin_text(monkeypatch, source):
+    def test_linting_with_stdin_text(monkeypatch, backend, source):
         clean_source, error_locations = find_error_locations(source)
         monkeypatch.setattr(pycodestyle, 'stdin_get_value',
                             lambda: clean_source)
@@ -1301,7 +1329,7 @@ all_implicit_relative_import_sources = [
     ('to_test', 'sources'), all_implicit_relative_import_sources)
 @py3skip
 def test_linting_implicit_relative_imports(
-        assert_lint, tmpdir, to_test, sources):
+        assert_lint, tmpdir, backend, to_test, sources):
     for name, source in sources.items():
         tmpdir.join(name).write_text(source, encoding='utf-8', ensure=True)
     assert_lint(sources[to_test], tmpdir.join(to_test))
@@ -1311,7 +1339,658 @@ def test_linting_implicit_relative_imports(
     ('to_test', 'sources'), all_implicit_relative_import_sources)
 @py2skip
 def test_linting_implicit_relative_imports_disabled_on_py3(
-        assert_lint, tmpdir, to_test, sources):
+        assert_lint, tmpdir, backend, to_test, sources):
     for name, source in sources.items():
         tmpdir.join(name).write_text(source, encoding='utf-8', ensure=True)
     assert_lint(sources[to_test], tmpdir.join(to_test), no_errors=True)
+
+
+def test_linting_rechecks_directory_listings(monkeypatch):
+    checked = []
+    monkeypatch.setattr(
+        'ebb_lint.listings.recheck', lambda: checked.append(True))
+    lint = EbbLint(None, 'source.py', lines=['x = 1\n'])
+    list(lint.run())
+    assert checked == [True]
+
+
+def test_drivers_are_shared_per_grammar():
+    from lib2to3 import pygram
+    from ebb_lint.flake8 import driver_for_grammar
+    print_driver = driver_for_grammar(pygram.python_grammar)
+    no_print_driver = driver_for_grammar(
+        pygram.python_grammar_no_print_statement)
+    assert print_driver is driver_for_grammar(pygram.python_grammar)
+    assert print_driver is not no_print_driver
+    assert print_driver.grammar is pygram.python_grammar
+    assert no_print_driver.grammar is pygram.python_grammar_no_print_statement
+
+
+@py3skip
+def test_alternating_grammars(tmpdir):
+    sources = [
+        '''
+
+$L202$print 'hi'
+
+        ''',
+
+        '''
+
+from __future__ import print_function
+$L202$print('hi', end='')
+
+        ''',
+    ]
+    for e, source in enumerate(sources * 2):
+        clean_source, error_locations = find_error_locations(source)
+        sourcefile = tmpdir.join('source{}.py'.format(e))
+        sourcefile.write_text(clean_source, encoding='utf-8')
+        lint = EbbLint(ast.parse(clean_source), sourcefile.strpath)
+        assert [(line, col, message[:4])
+                for line, col, message, _ in lint.run()] == error_locations
+
+
+def lint_errors(sourcefile):
+    lint = EbbLint(None, sourcefile.strpath)
+    return [(line, col, message) for line, col, message, _ in lint.run()]
+
+
+@pytest.mark.parametrize('source', [
+    '',
+    'x',
+    'x\n',
+    'x = 1\n\ny = 2',
+    'x\r\ny\rz\n',
+    'a\x0bb\x0cc\x1cd\x1de\x1ef\x85g\u2028h\u2029i\r\r\n\n',
+])
+def test_lines(source):
+    lines = Lines(source)
+    expected = []
+    byte = 0
+    for line in split_lines(source):
+        expected.append((len(expected) + 1, byte, line))
+        byte += len(line)
+    assert list(lines) == expected
+    assert len(lines) == len(expected) + 1
+    assert lines[0] == (0, '')
+    for lineno, start, line in expected:
+        assert lines[lineno] == (start, line)
+        for column in range(len(line)):
+            assert lines.byte_of_pos(lineno, column) == start + column
+            assert lines.position_of_byte(start + column) == (lineno, column)
+    if expected:
+        lineno, _, line = expected[-1]
+        assert lines.last_pos == (lineno, len(line))
+    else:
+        assert lines.last_pos == (0, 0)
+    assert lines.position_of_byte(len(source)) == lines.last_pos
+    assert lines.byte_of_pos(len(expected) + 1, 0) == len(source)
+    with pytest.raises(IndexError):
+        lines[len(expected) + 1]
+    with pytest.raises(IndexError):
+        lines.byte_of_pos(len(expected) + 2, 0)
+
+
+def no_reading(*a, **kw):
+    raise AssertionError('the file was read')
+
+
+def test_provided_lines_are_not_reread(monkeypatch, tmpdir):
+    monkeypatch.setattr(
+        'ebb_lint.flake8.read_source_bytes', no_reading)
+    filename = tmpdir.join('source.py').strpath
+    lint = EbbLint(None, filename, lines=['import os\n', 'import pdb'])
+    assert [(line, col, message[:4])
+            for line, col, message, _ in lint.run()] == [
+        (2, 10, 'L301'), (2, 7, 'L203')]
+
+
+def test_provided_bytes_are_decoded(monkeypatch, tmpdir):
+    monkeypatch.setattr(
+        'ebb_lint.flake8.read_source_bytes', no_reading)
+    filename = tmpdir.join('source.py').strpath
+    lint = EbbLint(None, filename, lines=[
+        b'# coding: latin-1\n', b'x = "\xe9"; import pdb\n'])
+    assert lint.source == '# coding: latin-1\nx = "\xe9"; import pdb\n'
+    assert [(line, col, message[:4])
+            for line, col, message, _ in lint.run()] == [(2, 16, 'L203')]
+
+
+@pytest.mark.parametrize('mmap_threshold', [1, 64 * 1024])
+@pytest.mark.parametrize('data', [
+    b'x = 1\n',
+    b'x = 1',
+    b'#!/usr/bin/env python\n# coding: latin-1\nx = "\xe9"\n',
+    b'\xef\xbb\xbfx = "\xc3\xa9"\n',
+    b'x = 1\r\ny = 2\rz = 3\r\n',
+])
+def test_reading_files(monkeypatch, tmpdir, mmap_threshold, data):
+    monkeypatch.setattr('ebb_lint.flake8._mmap_threshold', mmap_threshold)
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_binary(data)
+    with io.open(sourcefile.strpath, 'rb') as infile:
+        encoding = tokenize.detect_encoding(infile.readline)[0]
+    with io.open(sourcefile.strpath, encoding=encoding) as infile:
+        expected = infile.read()
+    assert read_file_using_source_encoding(sourcefile.strpath) == expected
+
+
+def test_files_are_opened_once(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import pdb\n', encoding='utf-8')
+    opened = []
+
+    def counting_open(*a, **kw):
+        opened.append(a)
+        return io.open(*a, **kw)
+
+    monkeypatch.setattr('ebb_lint.flake8.open', counting_open, raising=False)
+    lint = EbbLint(None, sourcefile.strpath)
+    assert [e[2][:4] for e in lint.run()] == ['L203']
+    assert opened == [(sourcefile.strpath, 'rb')]
+    assert lint.source_bytes == b'import pdb\n'
+
+
+def test_cached_results_skip_parsing(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import pdb', encoding='utf-8')
+    errors = lint_errors(sourcefile)
+    assert [e[2][:4] for e in errors] == ['L301', 'L203']
+
+    def no_parsing(*a, **kw):
+        raise AssertionError('the source was parsed')
+
+    monkeypatch.setattr('ebb_lint.flake8.parse_source', no_parsing)
+    monkeypatch.setattr('ebb_lint.flake8.detect_future_features', no_parsing)
+    assert lint_errors(sourcefile) == errors
+
+
+def test_cached_results_depend_on_source(tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import pdb\n', encoding='utf-8')
+    assert len(lint_errors(sourcefile)) == 1
+    sourcefile.write_text('import os\n', encoding='utf-8')
+    assert lint_errors(sourcefile) == []
+
+
+def test_cached_results_depend_on_options(tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('spam = 1\n', encoding='utf-8')
+    assert lint_errors(sourcefile) == []
+    EbbLint.options.max_line_length = 5
+    EbbLint.options.hard_max_line_length = 5
+    assert [e[2][:4] for e in lint_errors(sourcefile)] == ['L302']
+
+
+@py3skip
+def test_cached_results_depend_on_neighbouring_files(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import spam\n', encoding='utf-8')
+    assert lint_errors(sourcefile) == []
+    tmpdir.join('spam.py').write_text('', encoding='utf-8')
+    # In case the filesystem's times are too coarse to have seen the change.
+    os.utime(tmpdir.strpath, (0, 0))
+    assert [e[2][:4] for e in lint_errors(sourcefile)] == ['L206']
+
+    def no_parsing(*a, **kw):
+        raise AssertionError('the source was parsed')
+
+    monkeypatch.setattr('ebb_lint.flake8.parse_source', no_parsing)
+    assert [e[2][:4] for e in lint_errors(sourcefile)] == ['L206']
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_disabling_the_cache(tmpdir):
+    assert EbbLint._result_store is None
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import pdb\n', encoding='utf-8')
+    assert len(lint_errors(sourcefile)) == 1
+    assert not tmpdir.join('cache').check()
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_disabling_the_cache_of_checkers_and_grammars(monkeypatch, tmpdir):
+    monkeypatch.setattr(EbbLint, 'collected_checkers', None)
+    EbbLint.parse_options(EbbLint.options)
+    assert grammars.cache_dir is None
+    assert not tmpdir.join('cache').check()
+
+
+def test_projects_cannot_configure_the_cache_dir():
+    parser, _ = get_parser()
+    assert 'ebb-lint-cache-dir' not in parser.config_options
+    assert 'ebb-lint-cache-size' in parser.config_options
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache', '--ebb-lint-tree-cache')
+def test_cached_trees_skip_parsing(monkeypatch, tmpdir):
+    first = tmpdir.join('first.py')
+    first.write_text('import pdb\n', encoding='utf-8')
+    second = tmpdir.join('__init__.py')
+    second.write_text('import pdb\n', encoding='utf-8')
+    assert [e[2][:4] for e in lint_errors(first)] == ['L203']
+
+    def no_parsing(*a, **kw):
+        raise AssertionError('the source was parsed')
+
+    monkeypatch.setattr('ebb_lint.flake8.parse_source', no_parsing)
+    assert [e[2][:4] for e in lint_errors(second)] == ['L203']
+
+
+ast_backend_codes = {
+    'L101', 'L102', 'L103', 'L104', 'L203', 'L211', 'L212', 'L301', 'L302',
+    'L303'}
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_ast_backend_alone(monkeypatch, tmpdir, source):
+    clean_source, _ = find_error_locations(source)
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(clean_source, encoding='utf-8')
+    monkeypatch.setattr(EbbLint, '_result_store', None)
+    expected = sorted(
+        e for e in lint_errors(sourcefile) if e[2][:4] in ast_backend_codes)
+
+    EbbLint.options.ebb_lint_backend = 'hybrid'
+    EbbLint.options.no_ebb_lint_cache = True
+    EbbLint.parse_options(EbbLint.options)
+    # Pretend only the checkers with ast versions are enabled.
+    monkeypatch.setattr(EbbLint, 'active_checkers', [])
+
+    def no_parsing(*a, **kw):
+        raise AssertionError('the source was parsed')
+
+    monkeypatch.setattr('ebb_lint.flake8.parse_source', no_parsing)
+    assert sorted(lint_errors(sourcefile)) == expected
+
+
+def test_unknown_backend():
+    EbbLint.options.ebb_lint_backend = 'spam'
+    with pytest.raises(ValueError):
+        EbbLint.parse_options(EbbLint.options)
+
+
+def incremental_edits(source):
+    lines = split_lines(source)
+    for lineno in sorted({1, len(lines) // 2 + 1, len(lines)}):
+        if not 1 <= lineno <= len(lines):
+            continue
+        line = lines[lineno - 1].rstrip('\r\n')
+        # Add a statement, delete a line, and add a comment.
+        yield (lineno, 0), (lineno, 0), 'import pdb\n'
+        yield (lineno, 0), (lineno + 1, 0), ''
+        yield (lineno, len(line)), (lineno, len(line)), '  # noqa'
+
+
+def full_lint_errors(filename, source):
+    try:
+        return IncrementalLint(filename, source).errors
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_incremental_edits_match_full_lint(tmpdir, source):
+    clean_source, _ = find_error_locations(source)
+    filename = tmpdir.join('source.py').strpath
+    for start, end, text in incremental_edits(clean_source):
+        lint = IncrementalLint(filename, clean_source)
+        try:
+            errors = lint.edit(start, end, text)
+        except Exception as e:
+            errors = type(e)
+        assert errors == full_lint_errors(filename, lint.source)
+
+
+incremental_source = '''# coding: utf-8
+# I sincerely swear that this is one-off code.
+import os
+
+
+def f():
+    return os
+
+
+@spam
+def g():
+    # python 2 would complain about parentheses without the space.
+    print ('eggs')
+
+
+# Comments before a statement are in its chunk.
+class Spam(object):
+    pass
+'''
+
+
+def error_codes(errors):
+    return [(line, col, message[:4]) for line, col, message in errors]
+
+
+def test_incremental_edits_only_relint_the_edited_chunk(monkeypatch, tmpdir):
+    filename = tmpdir.join('source.py').strpath
+    lint = IncrementalLint(filename, incremental_source)
+    assert lint.errors == []
+    parsed = []
+
+    def recording_parse_source(driver, source, tokens=None):
+        parsed.append(source)
+        return parse_source(driver, source, tokens)
+
+    monkeypatch.setattr(
+        'ebb_lint.flake8.parse_source', recording_parse_source)
+    errors = lint.edit((13, 4), (13, 18), 'import pdb')
+    assert parsed == [(
+        '\n\n@spam\ndef g():\n'
+        '    # python 2 would complain about parentheses without the space.\n'
+        '    import pdb\n')]
+    assert error_codes(errors) == [(13, 11, 'L203')]
+
+    del parsed[:]
+    errors = lint.edit((7, 4), (7, 13), 'x = [\n        os]\n    return x')
+    assert parsed == ['\n\ndef f():\n    x = [\n        os]\n    return x\n']
+    assert error_codes(errors) == [(15, 11, 'L203')]
+    assert errors == full_lint_errors(filename, lint.source)
+
+    del parsed[:]
+    errors = lint.edit((20, 4), (20, 8), 'print (1)')
+    assert parsed == [(
+        '\n\n# Comments before a statement are in its chunk.\n'
+        'class Spam(object):\n    print (1)\n')]
+    assert error_codes(errors) == [(15, 11, 'L203')]
+
+
+def test_incremental_edits_to_the_header_relint_everything(tmpdir):
+    filename = tmpdir.join('source.py').strpath
+    lint = IncrementalLint(filename, incremental_source)
+    errors = lint.edit((2, 0), (3, 0), '')
+    assert [e[2][:4] for e in errors] == ['L202']
+    assert lint.source.count('\n') == incremental_source.count('\n') - 1
+    assert errors == full_lint_errors(filename, lint.source)
+
+
+def test_incremental_edits_which_cannot_be_linted(tmpdir):
+    filename = tmpdir.join('source.py').strpath
+    lint = IncrementalLint(filename, incremental_source)
+    with pytest.raises(TokenError):
+        lint.edit((7, 4), (7, 4), 'x = (\n')
+    errors = lint.edit((7, 9), (7, 9), ')')
+    assert errors == full_lint_errors(filename, lint.source) == []
+
+
+@pytest.mark.parametrize(('pattern', 'types'), [
+    ('any', None),
+    ('any< any* >', None),
+    ('STRING', {token.STRING}),
+    ("'spam'", {token.NAME}),
+    ('atom< any* >', {python_symbols.atom}),
+    ('( atom | power< any* > )', {python_symbols.atom, python_symbols.power}),
+    ('( atom | any )', None),
+    ('[ atom ]', {python_symbols.atom}),
+    ('( atom any )', None),
+    ('atom*', {python_symbols.atom}),
+    ('(not atom)', None),
+])
+def test_pattern_root_types(pattern, types):
+    root_types = pattern_root_types(patcomp.compile_pattern(pattern))
+    assert root_types == (None if types is None else frozenset(types))
+
+
+def parsed_tree(source):
+    clean_source, _ = find_error_locations(source)
+    future_features = detect_future_features(TokenTable(clean_source))
+    tree, _ = parse_source(
+        driver_for_grammar(grammar_for_future_features(future_features)),
+        clean_source)
+    return tree
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_checker_index_finds_every_match(source):
+    tree = parsed_tree(source)
+    by_type, any_type = EbbLint.collected_index
+    for node in tree.pre_order():
+        candidates = by_type.get(node.type, any_type)
+        for checker in EbbLint.collected_checkers:
+            if checker[0].match(node, {}):
+                assert checker in candidates
+
+
+def identities(results):
+    return {
+        name: [id(n) for n in value] if isinstance(value, list) else id(value)
+        for name, value in results.items()}
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_compiled_matchers_match_like_lib2to3(source):
+    tree = parsed_tree(source)
+    for node in tree.pre_order():
+        for matcher, _, _ in EbbLint.collected_checkers:
+            expected, actual = {}, {}
+            assert (matcher.match(node, actual)
+                    == matcher.pattern.match(node, expected))
+            assert identities(actual) == identities(expected)
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_bottom_matcher_finds_every_match(source):
+    tree = parsed_tree(source)
+    candidates = {
+        id(node): checkers
+        for node, checkers in BottomMatcher(
+            EbbLint.collected_checkers).run(tree)}
+    for node in tree.pre_order():
+        for checker in EbbLint.collected_checkers:
+            if checker[0].match(node, {}):
+                assert checker in candidates[id(node)]
+
+
+def test_bottom_matcher_reduces_most_patterns():
+    bottom_matcher = BottomMatcher(EbbLint.collected_checkers)
+    assert len(bottom_matcher.unreduced) < len(EbbLint.collected_checkers) / 2
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache', '--ebb-lint-bottom-matcher')
+@pytest.mark.parametrize('source', all_sources)
+def test_linting_with_the_bottom_matcher(tmpdir, source):
+    clean_source, error_locations = find_error_locations(source)
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(clean_source, encoding='utf-8')
+    assert EbbLint.active_bottom_matcher is not None
+    errors = [
+        (line, col, message[:4])
+        for line, col, message in lint_errors(sourcefile)]
+    assert sorted(errors) == sorted(error_locations)
+
+
+def select(*prefixes):
+    EbbLint.options.ignore_code = lambda code: not code.startswith(prefixes)
+    EbbLint.parse_options(EbbLint.options)
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+@pytest.mark.parametrize('prefixes', [
+    ('L1', 'L303'), ('L2', 'L301'), ('L201', 'L302')])
+@pytest.mark.parametrize('source', all_sources)
+def test_linting_with_selected_errors(tmpdir, backend, source, prefixes):
+    clean_source, error_locations = find_error_locations(source)
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(clean_source, encoding='utf-8')
+    select(*prefixes)
+    errors = [
+        (line, col, message[:4])
+        for line, col, message in lint_errors(sourcefile)]
+    assert sorted(errors) == sorted(
+        e for e in error_locations if e[2].startswith(prefixes))
+
+
+def test_deselected_checkers_are_pruned():
+    all_checkers = EbbLint.collected_checkers
+    select('L102', 'L202')
+    pruned = {checker.__name__ for _, checker, _ in EbbLint.active_checkers}
+    assert pruned == {
+        'scan_top_level_comments', 'check_for_print', 'check_docstring'}
+    assert len(all_checkers) > len(pruned)
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_nothing_is_parsed_without_checkers(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text('import pdb', encoding='utf-8')
+    select('L3')
+    assert EbbLint.active_checkers == []
+    monkeypatch.setattr('ebb_lint.flake8.parse_source', no_reading)
+    assert [e[2][:4] for e in lint_errors(sourcefile)] == ['L301']
+
+
+long_line_with_noqa = "x = '{}'  # noqa\n".format('x' * 200)
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_deselected_line_lengths_are_not_measured(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(long_line_with_noqa, encoding='utf-8')
+    select('L303')
+    monkeypatch.setattr(EbbLint, '_check_line_lengths', no_reading)
+    lint = EbbLint(None, sourcefile.strpath)
+    assert [e[2][:4] for e in lint.run()] == ['L303']
+    assert lint._line_bytes is None
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+@pytest.mark.parametrize('source', ['x = 1  # noqa\n', long_line_with_noqa])
+def test_nothing_is_counted_without_lines_between_the_limits(
+        tmpdir, source):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(source, encoding='utf-8')
+    lint = EbbLint(None, sourcefile.strpath)
+    assert 'L303' in [e[2][:4] for e in lint.run()]
+    assert lint._line_bytes is None
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+@pytest.mark.parametrize('n_padding', [0, 100])
+def test_only_lines_between_the_limits_are_counted(tmpdir, n_padding):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(
+        "x = 'spam'\n" + long_line_with_noqa
+        + "y = '{}'  # {}\n".format('y' * 80, 'y')
+        + 'z = """\n{}\n"""\n'.format('z' * 90)
+        # With enough short lines, only the long ones are counted.
+        + "w = 'w'  # w\n" * n_padding,
+        encoding='utf-8')
+    lint = EbbLint(None, sourcefile.strpath)
+    assert [e[2][:4] for e in lint.run()] == ['L303', 'L302']
+    strings = lint._line_bytes['string literals']
+    comments = lint._line_bytes['comments']
+    assert (strings[3], strings[5], comments[3]) == (82, 90, 3)
+    if n_padding:
+        assert sum(strings) + sum(comments) == 82 + 90 + 3
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+@pytest.mark.parametrize('separator', ['', '\x0c', '# \x1c\u2028'])
+def test_lines_are_numbered_like_the_tokenizer_numbers_them(
+        tmpdir, separator):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(
+        'x = 1\n{}\ny = 2\nz = "{}"\nw = [{}]\n'.format(
+            separator, 'a' * 90, ', '.join(['1'] * 30)),
+        encoding='utf-8')
+    lint = EbbLint(None, sourcefile.strpath)
+    assert [(e[0], e[2][:4]) for e in lint.run()] == [(5, 'L302')]
+    assert lint._line_bytes['string literals'][4] == 92
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_deselected_noqa_is_not_looked_for(monkeypatch, tmpdir):
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(long_line_with_noqa, encoding='utf-8')
+    select('L302')
+    monkeypatch.setattr('ebb_lint.flake8._pycodestyle_noqa', no_reading)
+    assert [e[2][:4] for e in lint_errors(sourcefile)] == ['L302']
+
+
+scoped_source = '''
+def f():
+    g()
+
+    def h():
+        i()
+    j()
+'''
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_checkers_on_entering_and_exiting(monkeypatch, tmpdir):
+    calls = []
+
+    def enter_function(name, context):
+        context.set('function', name.value)
+        calls.append(('enter', name.value))
+        return []
+
+    def call(name, context):
+        calls.append((context.get('function'), name.value))
+        return []
+
+    def exit_function(name, context):
+        calls.append(('exit', name.value, context.get('function')))
+        yield name, Errors.no_debuggers, {}
+
+    function = "funcdef< 'def' name=NAME any* >"
+    checkers = [
+        (compile_pattern(function), enter_function, {'pass_context': True}),
+        (compile_pattern(function), exit_function,
+         {'pass_context': True, 'on_exit': True}),
+        (compile_pattern("power< name=NAME trailer< '(' ')' > >"), call,
+         {'pass_context': True}),
+    ]
+    monkeypatch.setattr(EbbLint, 'active_checkers', checkers)
+    monkeypatch.setattr(EbbLint, 'active_index', index_checkers(checkers))
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(scoped_source, encoding='utf-8')
+    assert [e[:2] for e in lint_errors(sourcefile)] == [(5, 8), (2, 4)]
+    assert calls == [
+        ('enter', 'f'), ('f', 'g'), ('enter', 'h'), ('h', 'i'),
+        ('exit', 'h', 'h'), ('f', 'j'), ('exit', 'f', 'f')]
+
+
+@pytest.mark.flake8_args('--no-ebb-lint-cache')
+def test_linting_deeply_nested_literals(tmpdir, backend):
+    depth = sys.getrecursionlimit()
+    sourcefile = tmpdir.join('source.py')
+    sourcefile.write_text(
+        'x = {}1{}\ny = [\n    1\n]\n'.format('[' * depth, ']' * depth),
+        encoding='utf-8')
+    EbbLint.options.max_line_length = 10 * depth
+    EbbLint.options.hard_max_line_length = 10 * depth
+    assert [e[:2] + (e[2][:4],) for e in lint_errors(sourcefile)] == [
+        (3, 4, 'L201')]
+
+
+@pytest.mark.parametrize('source', all_sources)
+def test_subtree_types_cover_every_match(source):
+    tree = parsed_tree(source)
+    types = EbbLint.collected_subtree_types
+    for node in tree.pre_order():
+        if not any(matcher.match(node, {})
+                   for matcher, _, _ in EbbLint.collected_checkers):
+            continue
+        while node is not None:
+            assert node.type in types
+            node = node.parent
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("'spam'", [6]),
+    ('"""spam\neggs\r\n"""', [7, 4, 3]),
+    ("'spam\\\n  eggs'", [6, 7]),
+])
+def test_bytes_on_line(value, expected):
+    tok = Token(token.STRING, value, 2, 4, None)
+    assert [
+        bytes_on_line(tok, lineno)
+        for lineno in range(2, 2 + len(expected))] == expected
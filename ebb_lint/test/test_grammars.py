@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+
+import os
+import sys
+
+import lib2to3
+import pytest
+from lib2to3.pgen2 import driver
+
+from ebb_lint import grammars
+
+
+lib2to3_dir = os.path.dirname(lib2to3.__file__)
+
+
+def plain(g):
+    tables = {
+        name: dict(value) if isinstance(value, dict) else value
+        for name, value in vars(g).items()}
+    tables['dfas'] = {
+        number: (states, dict(first))
+        for number, (states, first) in tables['dfas'].items()}
+    return tables
+
+
+@pytest.mark.parametrize('source', ['Grammar.txt', 'PatternGrammar.txt'])
+def test_tables_round_trip(tmpdir, source):
+    g = driver.load_grammar(os.path.join(lib2to3_dir, source))
+    path = tmpdir.join('tables').strpath
+    grammars.dump_tables(g, path)
+    loaded = grammars.load_tables(path)
+    assert plain(loaded) == plain(g)
+    for number, (states, _) in loaded.dfas.items():
+        assert states is loaded.states[number - 256]
+
+
+def test_load_pygram():
+    from lib2to3 import pygram
+    assert grammars.load_pygram() is pygram
+
+
+@pytest.fixture
+def fresh_pygram(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'lib2to3.pygram')
+    monkeypatch.delattr(lib2to3, 'pygram')
+
+
+@pytest.mark.usefixtures('fresh_pygram')
+def test_unshipped_tables_are_cached(monkeypatch, tmpdir):
+    monkeypatch.setattr(grammars, 'cache_dir', tmpdir.join('cache').strpath)
+    monkeypatch.setattr(grammars, 'tables_dir', tmpdir.join('none').strpath)
+    reference = driver.load_grammar(os.path.join(lib2to3_dir, 'Grammar.txt'))
+    pygram = grammars.load_pygram()
+    assert plain(pygram.python_grammar) == plain(reference)
+    assert len(tmpdir.join('cache').listdir()) == 2
+
+    def no_loading(*a, **kw):
+        raise AssertionError('the grammar was loaded by lib2to3')
+
+    monkeypatch.delitem(sys.modules, 'lib2to3.pygram')
+    monkeypatch.setattr(driver, 'load_packaged_grammar', no_loading)
+    pygram = grammars.load_pygram()
+    assert plain(pygram.python_grammar) == plain(reference)
+    assert driver.load_packaged_grammar is no_loading
+
+
+@pytest.mark.usefixtures('fresh_pygram')
+def test_tables_are_not_cached_without_a_cache_dir(monkeypatch, tmpdir):
+    monkeypatch.setattr(grammars, 'cache_dir', None)
+    monkeypatch.setattr(grammars, 'tables_dir', tmpdir.join('none').strpath)
+    monkeypatch.setenv('XDG_CACHE_HOME', tmpdir.join('cache').strpath)
+    reference = driver.load_grammar(os.path.join(lib2to3_dir, 'Grammar.txt'))
+    pygram = grammars.load_pygram()
+    assert plain(pygram.python_grammar) == plain(reference)
+    assert tmpdir.listdir() == []
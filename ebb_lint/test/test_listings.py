@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from ebb_lint import listings
+from ebb_lint.listings import directory_names
+
+
+@pytest.fixture
+def listdir_calls(monkeypatch):
+    monkeypatch.setattr(listings, '_listings', {})
+    monkeypatch.setattr(listings, '_checked', set())
+    calls = []
+    listdir = os.listdir
+
+    def counting_listdir(path):
+        calls.append(path)
+        return listdir(path)
+
+    monkeypatch.setattr(os, 'listdir', counting_listdir)
+    return calls
+
+
+def test_directories_are_listed_once(tmpdir, listdir_calls):
+    tmpdir.join('spam.py').write('')
+    tmpdir.mkdir('eggs')
+    assert directory_names(tmpdir.strpath) == {'spam.py', 'eggs'}
+    listings.recheck()
+    assert directory_names(tmpdir.strpath) == {'spam.py', 'eggs'}
+    assert listdir_calls == [tmpdir.strpath]
+
+
+def test_directories_are_only_checked_for_changes_on_recheck(
+        tmpdir, listdir_calls):
+    assert directory_names(tmpdir.strpath) == frozenset()
+    tmpdir.join('spam.py').write('')
+    # In case the filesystem's times are too coarse to have seen the change.
+    os.utime(tmpdir.strpath, (0, 0))
+    assert directory_names(tmpdir.strpath) == frozenset()
+    listings.recheck()
+    assert directory_names(tmpdir.strpath) == {'spam.py'}
+    assert listdir_calls == [tmpdir.strpath, tmpdir.strpath]
+
+
+def test_missing_directories_are_empty(tmpdir, listdir_calls):
+    spam = tmpdir.join('spam')
+    assert directory_names(spam.strpath) == frozenset()
+    assert listdir_calls == []
+    spam.mkdir()
+    spam.join('eggs.py').write('')
+    assert directory_names(spam.strpath) == frozenset()
+    listings.recheck()
+    assert directory_names(spam.strpath) == {'eggs.py'}
+    assert listdir_calls == [spam.strpath]
+
+
+def test_relative_directories(tmpdir, listdir_calls):
+    tmpdir.join('spam.py').write('')
+    with tmpdir.as_cwd():
+        assert directory_names('') == {'spam.py'}
+        assert directory_names('.') == {'spam.py'}
+    assert listdir_calls == [tmpdir.strpath]
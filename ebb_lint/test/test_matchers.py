@@ -0,0 +1,134 @@
+from __future__ import unicode_literals
+
+from lib2to3.pgen2 import token
+
+import pytest
+
+from ebb_lint.flake8 import driver_for_grammar
+from ebb_lint.grammars import load_pygram
+from ebb_lint.matchers import (
+    Matcher, compile_pattern, generate_matcher, index_checkers,
+    subtree_types)
+
+
+source = '''
+import os, sys
+from os import path as p, sep
+
+
+@decorator
+def f(a, b=1, *args, **kwargs):
+    """Docstring."""
+    if a:
+        pass
+    elif b:
+        return (a)
+    else:
+        x = [i for i in args if i]
+    try:
+        pass
+    except:
+        pass
+    return map(lambda x: x, kwargs)
+
+
+class C(object):
+    y = f(1, 2)(3)[4].z
+'''
+
+
+@pytest.fixture(scope='module')
+def tree():
+    driver = driver_for_grammar(load_pygram().python_grammar)
+    return driver.parse_string(source)
+
+
+def identities(results):
+    return {
+        name: [id(n) for n in value] if isinstance(value, list) else id(value)
+        for name, value in results.items()}
+
+
+@pytest.mark.parametrize('pattern', [
+    'any',
+    'NAME',
+    "'if'",
+    "x='pass'",
+    'funcdef',
+    'n=funcdef< any* >',
+    "funcdef< 'def' name=NAME any* >",
+    "funcdef< 'def' name=NAME params=parameters ':' body=suite >",
+    "funcdef< 'def' any* body=suite< any* stmt=simple_stmt any* > >",
+    'suite< a=any* simple_stmt b=any* simple_stmt c=any* >',
+    'suite< any{2,3} rest=any* >',
+    'suite< any+ last=any >',
+    'suite< any* [ s=simple_stmt ] any* >',
+    'suite< any* ( s=simple_stmt | c=compound_stmt )+ any* >',
+    "if_stmt< 'if' any* (not 'else') >",
+    "if_stmt< any* ( 'elif' cond=any ':' suite )* any* >",
+    "all=( funcdef< any* > | classdef< any* > | 'import' )",
+    "power< f=('map' | 'filter') trailer< '(' args=any* ')' > any* >",
+    "trailer< '(' arglist< a=any ',' b=any > ')' >",
+    "import_from< 'from' mod=(NAME | dotted_name) 'import' any* >",
+    'any< any* ( atom< any* > any )* >',
+    'any*',
+    'x=any{0,1}',
+])
+def test_matchers_match_like_lib2to3(tree, pattern):
+    matcher = compile_pattern(pattern)
+    matched = 0
+    for node in tree.pre_order():
+        expected, actual = {}, {}
+        result = matcher.match(node, actual)
+        assert result == matcher.pattern.match(node, expected)
+        assert identities(actual) == identities(expected)
+        matched += result
+    assert matched
+
+
+def test_patterns_are_compiled_once():
+    assert compile_pattern('atom< any* >') is compile_pattern('atom< any* >')
+
+
+def test_unhandled_patterns_are_left_to_lib2to3():
+    load_pygram()
+    from lib2to3 import patcomp
+    pattern = patcomp.compile_pattern('any*')
+    source, patterns = generate_matcher(pattern)
+    assert patterns == [pattern]
+    assert Matcher(pattern).match == pattern.match
+
+
+def index_for(*patterns):
+    return index_checkers([
+        (compile_pattern(pattern), None, {}) for pattern in patterns])
+
+
+def test_subtree_types():
+    pygram = load_pygram()
+    symbols = pygram.python_symbols
+    types = subtree_types(
+        index_for('funcdef< any* >'), pygram.python_grammar)
+    assert {
+        symbols.funcdef, symbols.decorated,
+        symbols.suite, symbols.if_stmt, symbols.classdef,
+        symbols.file_input} <= types
+    assert not {
+        symbols.expr_stmt, symbols.atom, symbols.power, symbols.lambdef,
+        token.NAME} & types
+
+
+def test_every_subtree_can_have_an_atom(tree):
+    pygram = load_pygram()
+    types = subtree_types(index_for('atom< any* >'), pygram.python_grammar)
+    for node in tree.pre_order():
+        if node.type == pygram.python_symbols.atom:
+            while node is not None:
+                assert node.type in types
+                node = node.parent
+
+
+def test_subtree_types_of_patterns_matching_any_type():
+    grammar = load_pygram().python_grammar
+    assert subtree_types(index_for('any'), grammar) is None
+    assert subtree_types(index_for(), grammar) == frozenset()
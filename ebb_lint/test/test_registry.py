@@ -0,0 +1,234 @@
+from __future__ import unicode_literals
+
+import importlib
+import re
+import tempfile
+from lib2to3 import pytree
+
+import pytest
+
+from ebb_lint import registry
+from ebb_lint.errors import Errors, error_code
+from ebb_lint.flake8 import driver_for_grammar, enabled_codes
+from ebb_lint.grammars import load_pygram
+
+
+def comparable(collected):
+    collected_checkers, collected_ast_checkers = collected
+    return (
+        [(matcher.source, checker, extra)
+         for matcher, checker, extra in collected_checkers],
+        collected_ast_checkers)
+
+
+def no_scanning(module):
+    raise AssertionError('{} was scanned'.format(module.__name__))
+
+
+@pytest.fixture
+def cache_dir(tmpdir):
+    return tmpdir.join('cache').strpath
+
+
+@pytest.fixture
+def imported(monkeypatch):
+    imported = []
+
+    def import_module(name):
+        imported.append(name)
+        return importlib.import_module(name)
+
+    monkeypatch.setattr(
+        registry, 'importlib', type(str('importlib'), (), {
+            'import_module': staticmethod(import_module)}))
+    return imported
+
+
+def test_collected_checkers_are_cached(monkeypatch, cache_dir):
+    scanned = registry.collect_checkers(cache_dir)
+    monkeypatch.setattr(registry, 'scan_module', no_scanning)
+    loaded = registry.collect_checkers(cache_dir)
+    assert comparable(loaded) == comparable(scanned)
+    for (matcher, _, _), (scanned_matcher, _, _) in zip(
+            loaded[0], scanned[0]):
+        assert matcher is not scanned_matcher
+        assert isinstance(matcher.pattern, pytree.BasePattern)
+
+
+def test_cached_matchers_match_the_same(cache_dir):
+    scanned = registry.collect_checkers(cache_dir)
+    loaded = registry.collect_checkers(cache_dir)
+    driver = driver_for_grammar(load_pygram().python_grammar)
+    tree = driver.parse_string(
+        'import pdb\n'
+        'def f(x):\n'
+        '    if x:\n'
+        '        pass\n'
+        '    return (x)\n')
+    for node in tree.pre_order():
+        for (matcher, _, _), (scanned_matcher, _, _) in zip(
+                loaded[0], scanned[0]):
+            loaded_results, scanned_results = {}, {}
+            assert (matcher.match(node, loaded_results)
+                    == scanned_matcher.match(node, scanned_results))
+            assert loaded_results == scanned_results
+
+
+def test_stale_registries_are_rebuilt(monkeypatch, cache_dir):
+    registry.collect_checkers(cache_dir)
+    monkeypatch.setattr(registry, 'registry_key', lambda: 'changed')
+    scanned = []
+    scan_module = registry.scan_module
+    monkeypatch.setattr(
+        registry, 'scan_module',
+        lambda module: scanned.append(module.__name__) or scan_module(module))
+    registry.collect_checkers(cache_dir)
+    registry.collect_checkers(cache_dir)
+    assert scanned == registry.checker_modules()
+
+
+def test_corrupt_registries_are_rebuilt(tmpdir, cache_dir):
+    scanned = registry.collect_checkers(cache_dir)
+    [path] = tmpdir.join('cache', 'checkers').listdir()
+    path.write_binary(b'garbage')
+    assert comparable(registry.collect_checkers(cache_dir)) == comparable(
+        scanned)
+    registry.load_registry(path.strpath)
+
+
+@pytest.mark.parametrize('which', ['file', 'directory'])
+def test_registries_others_can_write_to_are_not_loaded(
+        monkeypatch, tmpdir, cache_dir, which):
+    scanned = registry.collect_checkers(cache_dir)
+    [path] = tmpdir.join('cache', 'checkers').listdir()
+    if which == 'file':
+        path.chmod(0o666)
+    else:
+        path.dirpath().chmod(0o777)
+
+    def no_loading(path):
+        raise AssertionError('the registry was loaded')
+
+    monkeypatch.setattr(registry.pickle, 'load', no_loading)
+    assert comparable(registry.collect_checkers(cache_dir)) == comparable(
+        scanned)
+
+
+def test_nothing_is_cached_without_a_cache_dir(monkeypatch, tmpdir):
+    monkeypatch.setattr(tempfile, 'tempdir', tmpdir.strpath)
+    monkeypatch.setenv('XDG_CACHE_HOME', tmpdir.strpath)
+    scanned = registry.collect_checkers(None)
+    assert tmpdir.listdir() == []
+    assert comparable(registry.collect_checkers(None)) == comparable(scanned)
+
+
+def test_registry_key_depends_on_checker_sources(monkeypatch, tmpdir):
+    key = registry.registry_key()
+    sources = registry._sources()
+    changed = tmpdir.join('changed.py')
+    changed.write_binary(b'# changed\n')
+    monkeypatch.setattr(
+        registry, '_sources', lambda: sources[:-1] + [changed.strpath])
+    assert registry.registry_key() != key
+
+
+trailing_commas = 'ebb_lint.checkers.check_trailing_commas'
+
+
+def test_only_modules_with_enabled_codes_are_imported(cache_dir, imported):
+    registry.collect_checkers(cache_dir)
+    del imported[:]
+    collected_checkers, collected_ast_checkers = registry.collect_checkers(
+        cache_dir, frozenset(['L201']))
+    assert set(imported) == {trailing_commas}
+    assert [checker.__module__ for _, checker, _ in collected_checkers] == [
+        trailing_commas]
+    assert collected_ast_checkers == []
+
+    del imported[:]
+    assert registry.collect_checkers(cache_dir, frozenset(['L301'])) == (
+        [], [])
+    assert imported == []
+
+
+def test_only_modules_with_enabled_codes_are_scanned(
+        monkeypatch, cache_dir):
+    scanned = []
+    scan_module = registry.scan_module
+    monkeypatch.setattr(
+        registry, 'scan_module',
+        lambda module: scanned.append(module.__name__) or scan_module(module))
+    registry.collect_checkers(cache_dir, frozenset(['L201']))
+    assert trailing_commas in scanned
+    assert 'ebb_lint.checkers.check_docstrings' not in scanned
+
+    del scanned[:]
+    everything = registry.collect_checkers(cache_dir)
+    assert trailing_commas not in scanned
+    assert 'ebb_lint.checkers.check_docstrings' in scanned
+    assert comparable(everything) == comparable(
+        registry.collect_checkers(cache_dir))
+
+
+@pytest.mark.parametrize('name', [
+    name for name in registry.checker_modules()
+    if name != 'ebb_lint.checkers.registration'])
+def test_checker_modules_declare_the_errors_they_report(name):
+    module = importlib.import_module(name)
+    with open(module.__file__.rstrip('c'), 'rb') as infile:
+        source = infile.read().decode('utf-8')
+    used = {
+        error_code(getattr(Errors, m.group(1)))
+        for m in re.finditer(r'Errors\.(\w+)', source)}
+    assert sorted(used) == registry.module_codes(module)
+
+
+def test_checkers_declare_the_errors_they_report(cache_dir):
+    collected_checkers, _ = registry.collect_checkers(cache_dir)
+    for _, checker, extra in collected_checkers:
+        assert extra['errors']
+
+
+def test_modules_with_undeclared_errors_are_always_loaded(
+        monkeypatch, tmpdir):
+    tmpdir.join('undeclared_checkers.py').write(
+        'from ebb_lint.checkers.registration import register_checker\n'
+        'from ebb_lint.errors import Errors\n'
+        '@register_checker("any", errors=[Errors.no_print])\n'
+        'def declared():\n'
+        '    pass\n'
+        '@register_checker("any")\n'
+        'def undeclared():\n'
+        '    pass\n')
+    monkeypatch.syspath_prepend(tmpdir.strpath)
+    module = importlib.import_module('undeclared_checkers')
+    assert registry.module_codes(module) is None
+    del module.undeclared
+    assert registry.module_codes(module) == ['L202']
+
+
+class FakeOptions(object):
+    def __init__(self, select, ignore):
+        self.select = select
+        self.ignore = ignore
+
+    def ignore_code(self, code):
+        # Like pycodestyle's StyleGuide.ignore_code.
+        if len(code) < 4 and any(s.startswith(code) for s in self.select):
+            return False
+        return (code.startswith(self.ignore)
+                and not code.startswith(self.select))
+
+
+@pytest.mark.parametrize(('select', 'ignore', 'codes'), [
+    ((), ('E501',), {error_code(error) for error in Errors}),
+    (('L3',), ('',), {'L300', 'L301', 'L302', 'L303'}),
+    (('L201', 'L202'), ('',), {'L201', 'L202'}),
+    ((), ('L1', 'L2'), {'L300', 'L301', 'L302', 'L303'}),
+])
+def test_enabled_codes(select, ignore, codes):
+    assert enabled_codes(FakeOptions(select, ignore)) == codes
+
+
+def test_enabled_codes_without_flake8():
+    assert enabled_codes(object()) is None
@@ -0,0 +1,53 @@
+from __future__ import unicode_literals
+
+from lib2to3 import pygram
+
+from ebb_lint.flake8 import detect_future_features, driver_for_grammar
+from ebb_lint.tokens import TokenTable
+
+
+source = '''# coding: utf-8
+"""
+Spam.
+"""
+from __future__ import (
+    absolute_import, unicode_literals)
+
+import os  # eggs
+
+
+def f():
+    # spam
+    return os
+    # ham
+
+# eggs
+'''
+
+
+def test_parsing_the_token_stream():
+    d = driver_for_grammar(pygram.python_grammar_no_print_statement)
+    tree = d.parse_tokens(TokenTable(source).stream)
+    assert tree == d.parse_string(source)
+
+
+def test_missing_trailing_newline():
+    d = driver_for_grammar(pygram.python_grammar_no_print_statement)
+    tree = d.parse_tokens(TokenTable('spam = 1').stream)
+    assert str(tree) == 'spam = 1\n'
+
+
+def test_comments_between():
+    tokens = TokenTable(source)
+    assert [c.value for c in tokens.comments] == [
+        '# coding: utf-8', '# eggs', '# spam', '# ham', '# eggs']
+    assert [c.value for c in tokens.comments_between((1, 0), (2, 0))] == [
+        '# coding: utf-8']
+    assert [c.lineno for c in tokens.comments_between((8, 0), (13, 0))] == [
+        8, 12]
+    assert tokens.comments_between((8, 12), (12, 4)) == []
+
+
+def test_future_features():
+    assert detect_future_features(TokenTable(source)) == {
+        'absolute_import', 'unicode_literals'}
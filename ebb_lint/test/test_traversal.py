@@ -0,0 +1,130 @@
+from __future__ import unicode_literals
+
+import sys
+from lib2to3 import pygram
+from lib2to3.pgen2 import token
+
+from ebb_lint.flake8 import driver_for_grammar
+from ebb_lint.traversal import Context, Walker, first_leaf, last_leaf
+
+
+def test_flags_are_inherited():
+    context = Context({'spam': 1})
+    assert context.get('spam') == 1
+    assert context.get('eggs') is None
+    assert context.get('eggs', 2) == 2
+
+
+def test_flags_are_cleared_on_exit():
+    context = Context()
+    context.enter()
+    context.set('spam', 1)
+    context.enter()
+    assert context.get('spam') == 1
+    context.set('spam', 2)
+    context.set('eggs', 3)
+    assert context.flags() == {'spam': 2, 'eggs': 3}
+    context.exit()
+    assert context.flags() == {'spam': 1}
+    context.enter()
+    context.exit()
+    assert context.flags() == {'spam': 1}
+    context.exit()
+    assert context.flags() == {}
+
+
+def test_inherited_flags_are_restored():
+    context = Context({'spam': 1})
+    context.enter()
+    context.set('spam', 2)
+    context.set('spam', 3)
+    assert context.get('spam') == 3
+    context.exit()
+    assert context.flags() == {'spam': 1}
+
+
+def nested_source(depth):
+    return 'x = {}1{}\n'.format('[' * depth, ']' * depth)
+
+
+def parse(source):
+    return driver_for_grammar(pygram.python_grammar).parse_string(source)
+
+
+source = '''
+def f(x):
+    return [x, (x, {'y': x})]
+
+
+class C(object):
+    pass
+'''
+
+
+def test_walking_is_in_pre_order():
+    tree = parse(source)
+    assert [node for node, _ in Walker([tree])] == list(tree.pre_order())
+
+
+def test_walking_several_roots():
+    tree = parse(source)
+    assert [node for node, _ in Walker(tree.children)] == [
+        node for child in tree.children for node in child.pre_order()]
+
+
+def test_walking_only_some_types():
+    tree = parse(source)
+    types = {node.type for node in tree.pre_order() if node.children}
+    types.discard(pygram.python_symbols.parameters)
+    walked = [node for node, _ in Walker([tree], types)]
+    assert walked == [
+        node for node in tree.pre_order()
+        if node.children and not any(
+            n.type == pygram.python_symbols.parameters
+            for n in [node] + list(iter_ancestors(node)))]
+
+
+def iter_ancestors(node):
+    while node.parent is not None:
+        node = node.parent
+        yield node
+
+
+def test_exits_come_after_the_subtree():
+    tree = parse(source)
+    walker = Walker([tree])
+    events = []
+    for node, exiting in walker:
+        if exiting is not None:
+            events.append(exiting)
+        elif node.children:
+            walker.on_exit(node, ('first', node))
+            walker.on_exit(node, ('second', node))
+            events.append(('enter', node))
+    post_order = [node for node in tree.post_order() if node.children]
+    assert [e[1] for e in events if e[0] == 'second'] == post_order
+    for e, (what, node) in enumerate(events):
+        if what == 'second':
+            assert events[e + 1] == ('first', node)
+        elif what == 'enter':
+            end = events.index(('second', node))
+            inside = {id(n) for n, _ in Walker(node.children)}
+            assert all(
+                id(n) in inside for w, n in events[e + 1:end] if w == 'enter')
+
+
+def test_first_and_last_leaves():
+    tree = parse(source)
+    for node in tree.pre_order():
+        leaves = list(node.leaves()) or [node]
+        assert first_leaf(node) is leaves[0]
+        assert last_leaf(node) is leaves[-1]
+
+
+def test_walking_deeply_nested_trees():
+    depth = sys.getrecursionlimit()
+    tree = parse(nested_source(depth))
+    nodes = [node for node, _ in Walker([tree])]
+    assert sum(1 for node in nodes if node.type == token.LSQB) == depth
+    assert first_leaf(tree).value == 'x'
+    assert last_leaf(tree).type == token.ENDMARKER
@@ -0,0 +1,50 @@
+from __future__ import unicode_literals
+
+from lib2to3 import pygram, pytree
+
+from ebb_lint.flake8 import driver_for_grammar, parse_source
+from ebb_lint.trees import deserialize_tree, serialize_tree
+
+
+source = '''# coding: utf-8
+"""
+Spam.
+"""
+
+import os
+
+
+class Spam(object):  # eggs
+    def f(self, x=['\\ufffd', {1: 2}]):
+        return os.path.join(x, 'spam'
+                            'eggs')
+'''
+
+
+def parse(source):
+    d = driver_for_grammar(pygram.python_grammar_no_print_statement)
+    tree, _ = parse_source(d, source)
+    return tree
+
+
+def dump(tree):
+    return [
+        (node.type, node.prefix, getattr(node, 'value', None),
+         node.lineno, node.column, len(node.children))
+        if isinstance(node, pytree.Leaf) else
+        (node.type, len(node.children))
+        for node in tree.pre_order()]
+
+
+def test_round_trip():
+    tree = parse(source)
+    loaded = deserialize_tree(serialize_tree(tree))
+    assert str(loaded) == source
+    assert dump(loaded) == dump(tree)
+    assert loaded == tree
+
+
+def test_deep_nesting():
+    source = 'x = ' + '[' * 90 + ']' * 90 + '\n'
+    tree = parse(source)
+    assert str(deserialize_tree(serialize_tree(tree))) == source
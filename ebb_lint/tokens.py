@@ -0,0 +1,128 @@
+from __future__ import unicode_literals
+
+import bisect
+import collections
+import io
+from lib2to3.pgen2 import token, tokenize
+
+import six
+
+
+class Token(collections.namedtuple('Token', [
+        'type', 'value', 'lineno', 'column', 'end'])):
+    """
+    A single token, positioned the same way as a lib2to3 leaf.
+
+    ``lineno`` and ``column`` are where the token starts, in the same
+    coordinates lib2to3 gives its leaves, so a token can be reported anywhere
+    a leaf can. ``end`` is the ``(lineno, column)`` just past the token.
+    """
+
+
+_insignificant = frozenset([tokenize.COMMENT, tokenize.NL])
+_openers = frozenset('([{')
+_closers = frozenset(')]}')
+
+
+class TokenTable(object):
+    """
+    A whole file's tokens, as produced by lib2to3's tokenizer.
+
+    The file is only tokenized once, and everything that needs its tokens
+    reads them from here: ``stream`` is the full token stream, ready to be
+    passed to a lib2to3 driver's ``parse_tokens``. Comments and blank-line
+    tokens are kept apart in ``comments`` so that ``tokens`` holds only the
+    tokens a parser would see. The positions the stdlib ``ast`` module reports
+    can be converted to indices in ``tokens`` with ``index_of_node``.
+    """
+
+    def __init__(self, source):
+        if source and not source.endswith('\n'):
+            # Match what parse_source does.
+            source += '\n'
+        self._lines = source.splitlines(True)
+        self.stream = list(tokenize.generate_tokens(
+            io.StringIO(six.text_type(source)).readline))
+        self.tokens = []
+        self.comments = []
+        for typ, value, start, end, _ in self.stream:
+            tok = Token(typ, value, start[0], start[1], end)
+            if typ not in _insignificant:
+                self.tokens.append(tok)
+            elif typ == tokenize.COMMENT:
+                self.comments.append(tok)
+        self._starts = [(t.lineno, t.column) for t in self.tokens]
+        self._comment_starts = [(c.lineno, c.column) for c in self.comments]
+
+    def __getitem__(self, idx):
+        return self.tokens[idx]
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def index_at(self, lineno, column):
+        """
+        Find the first token starting at or after a position.
+        """
+        return bisect.bisect_left(self._starts, (lineno, column))
+
+    def index_of_node(self, node):
+        """
+        Find the first token at or after where an ``ast`` node starts.
+
+        ``ast`` counts columns in UTF-8 bytes rather than characters, and
+        before python 3.8 it reports some nodes (multi-line strings in
+        particular) at column -1 of their last line. The latter only ever
+        moves the position earlier, so callers searching forward from here
+        must expect to skip over some tokens.
+        """
+        lineno, column = node.lineno, node.col_offset
+        if column < 0:
+            column = 0
+        elif column:
+            line = self._lines[lineno - 1]
+            column = len(
+                line.encode('utf-8')[:column].decode('utf-8', 'replace'))
+        return self.index_at(lineno, column)
+
+    def comments_between(self, start, end):
+        """
+        Find the comments which start between two ``(lineno, column)``
+        positions, including ``start`` but not ``end``.
+        """
+        lower = bisect.bisect_left(self._comment_starts, start)
+        upper = bisect.bisect_left(self._comment_starts, end)
+        return self.comments[lower:upper]
+
+    def find(self, idx, *values):
+        """
+        Find the next index at or after ``idx`` where ``values`` appear in
+        sequence, or None if they never do.
+        """
+        n = len(values)
+        for start in range(idx, len(self.tokens) - n + 1):
+            if all(self.tokens[start + e].value == value
+                   for e, value in enumerate(values)):
+                return start
+        return None
+
+    def matching_close(self, idx):
+        """
+        Given the index of an opening bracket, find the index of the bracket
+        that closes it.
+        """
+        depth = 0
+        for idx in range(idx, len(self.tokens)):
+            tok = self.tokens[idx]
+            if tok.type != token.OP:
+                continue
+            if tok.value in _openers:
+                depth += 1
+            elif tok.value in _closers:
+                depth -= 1
+                if depth == 0:
+                    return idx
+        raise ValueError('unbalanced brackets')  # pragma: nocover
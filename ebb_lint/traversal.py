@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+
+import collections
+
+
+# lib2to3's own pre_order, post_order and leaves are recursive generators, so
+# every node they yield is passed up through one generator per level of the
+# tree above it, which makes walking a deeply nested tree (like a big literal
+# full of literals) quadratic. Everything here keeps its own stack instead.
+
+_missing = object()
+_Exit = collections.namedtuple('_Exit', ['node', 'value'])
+
+
+def first_leaf(node):
+    while node.children:
+        node = node.children[0]
+    return node
+
+
+def last_leaf(node):
+    while node.children:
+        node = node.children[-1]
+    return node
+
+
+class Walker(object):
+    """
+    Walk trees in pre-order, doing the same amount of work for every node
+    however deep it is.
+
+    Iterating yields ``(node, None)`` as each node is entered. While a node is
+    entered, ``on_exit(node, value)`` has ``(node, value)`` yielded once the
+    walk is done with the node's subtree; exits for the same node come in the
+    reverse of the order they were asked for.
+
+    If ``types`` is given, a node of any other type is skipped, along with its
+    whole subtree.
+    """
+
+    def __init__(self, roots, types=None):
+        self._stack = list(reversed(roots))
+        self._types = types
+
+    def on_exit(self, node, value):
+        self._stack.append(_Exit(node, value))
+
+    def __iter__(self):
+        stack = self._stack
+        types = self._types
+        while stack:
+            node = stack.pop()
+            if type(node) is _Exit:
+                yield node
+                continue
+            if types is not None and node.type not in types:
+                continue
+            yield node, None
+            if node.children:
+                stack.extend(node.children[::-1])
+
+
+class Context(object):
+    """
+    Flags which checkers set for everything below the node they matched.
+
+    The traversal calls ``enter`` before a checker on a node is passed the
+    context, and ``exit`` once it's done with the node's subtree; whatever was
+    set while the node was entered is put back the way it was on exit.
+    Checkers read the flags set on a node or any of its ancestors with
+    ``get``.
+    """
+
+    def __init__(self, inherited=()):
+        self._flags = dict(inherited)
+        self._depth = 0
+        self._undo = []
+
+    def get(self, name, default=None):
+        return self._flags.get(name, default)
+
+    def set(self, name, value):
+        self._undo.append((self._depth, name, self._flags.get(name, _missing)))
+        self._flags[name] = value
+
+    def flags(self):
+        return dict(self._flags)
+
+    def enter(self):
+        self._depth += 1
+
+    def exit(self):
+        undo = self._undo
+        while undo and undo[-1][0] == self._depth:
+            _, name, value = undo.pop()
+            if value is _missing:
+                del self._flags[name]
+            else:
+                self._flags[name] = value
+        self._depth -= 1
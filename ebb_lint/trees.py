@@ -0,0 +1,50 @@
+from __future__ import unicode_literals
+
+import marshal
+import zlib
+
+from lib2to3 import pytree
+
+
+# Trees are flattened into a pre-order list of plain tuples, which marshal can
+# write and read far faster than pickle can handle pytree objects. A leaf is
+# (type, value, prefix, lineno, column) and an interior node is (type,
+# number of children). Both directions are iterative, so deeply nested sources
+# don't run into the recursion limit.
+
+def serialize_tree(tree):
+    items = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, pytree.Leaf):
+            items.append((
+                node.type, node.value, node.prefix, node.lineno, node.column))
+        else:
+            items.append((node.type, len(node.children)))
+            stack.extend(reversed(node.children))
+    return zlib.compress(marshal.dumps(items))
+
+
+def deserialize_tree(data):
+    # Each entry on the stack is [type, number of children, children so far].
+    stack = []
+    for item in marshal.loads(zlib.decompress(data)):
+        if len(item) == 5:
+            typ, value, prefix, lineno, column = item
+            node = pytree.Leaf(typ, value, (prefix, (lineno, column)))
+        elif item[1]:
+            stack.append([item[0], item[1], []])
+            continue
+        else:
+            node = pytree.Node(item[0], [])
+        while stack:
+            parent = stack[-1]
+            parent[2].append(node)
+            if len(parent[2]) < parent[1]:
+                break
+            stack.pop()
+            node = pytree.Node(parent[0], parent[2])
+        else:
+            return node
+    raise ValueError('truncated tree data')
@@ -14,6 +14,9 @@ extras_require = {
         'pytest',
         'pytest-cov',
     ],
+    ':python_version < "3.2"': [
+        'futures',
+    ],
     ':python_version < "3.4"': [
         'enum34',
     ],
@@ -25,7 +28,6 @@ extras_require['all'] = list({
 
 install_requires = [
     'flake8>=2.6.0',
-    'intervaltree',
     'six',
     'venusian',
 ]
@@ -63,10 +65,16 @@ setup(
         'ebb_lint.checkers',
         'ebb_lint.test',
     ],
+    package_data={
+        'ebb_lint': ['grammar_tables/*.marshal'],
+    },
     install_requires=install_requires,
     extras_require=extras_require,
     setup_requires=['vcversioner'],
     entry_points={
+        'console_scripts': [
+            'ebb-lint = ebb_lint.cli:main',
+        ],
         'flake8.extension': [
             'L = ebb_lint:EbbLint',
         ],